@@ -1,6 +1,10 @@
+import time
+BOOT_STARTED = time.monotonic()
+
 import json
 import logging
-from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+import itertools
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, abort, send_file, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from dotenv import load_dotenv
@@ -9,10 +13,20 @@ import os
 
 # Import your Asistente class from the separate module
 from classes.asistente import Asistente
+from classes.answer_cache import AnswerCache
+from classes.model_router import ModelRouter
 from classes.RAG import RAGService
 from classes.asistente_osma import AsistenteOSMA
+from classes.osma_session_store import OsmaSessionStore
+from classes.osma_export import OsmaExporter
+from classes.osma_summary import OsmaSummarizer
 from classes.models import Feedback
 from classes.reference_maker import ReferenceMaker
+from classes.metrics import metrics, process_rss_mib
+from classes.osma_catalog import OsmaCatalog
+from classes.governor import OverloadedError
+from classes.stream_coalescer import StreamCoalescer
+from classes.static_assets import AssetManifest
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -37,24 +51,113 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-asistente = Asistente(db)  # Instantiate your class from classes/asistente.py
 rag_service = RAGService()
 
+# Un Asistente por especialidad; comparten clientes, caché de respuestas y router de modelos
+answer_cache = AnswerCache()
+model_router = ModelRouter()
+asistentes = {
+    specialty.name: Asistente(db, specialty=specialty, answer_cache=answer_cache, model_router=model_router)
+    for specialty in rag_service.specialties
+}
+osma_sessions = OsmaSessionStore(db)
+osma_summarizer = OsmaSummarizer()
+stream_coalescer = StreamCoalescer()
+asset_manifest = AssetManifest.get()
+
+# Datos inmutables que conviene construir una sola vez: con `gunicorn --preload` (ver
+# gunicorn.conf.py) se cargan en el proceso maestro y los workers los comparten tras el fork.
+OsmaCatalog.get().search_index
+logger.info(f"App loaded in {time.monotonic() - BOOT_STARTED:.2f}s (pid {os.getpid()}, rss {process_rss_mib():.0f} MiB)")
+
+def asset_url_for(endpoint, **values):
+    """
+    url_for de las plantillas: los archivos estáticos incluidos en el manifest de
+    build_assets.py se enlazan por su URL con hash (/assets/...).
+    """
+    if endpoint == "static":
+        hashed = asset_manifest.url(values.get("filename", ""))
+        if hashed and len(values) == 1:
+            return hashed
+    return url_for(endpoint, **values)
+
+
+app.jinja_env.globals["url_for"] = asset_url_for
+app.jinja_env.globals["asset_import_map"] = lambda: json.dumps(asset_manifest.import_map(app.static_url_path))
+
+def current_asistente():
+    """
+    Asistente de la especialidad pedida por la ruta (/<especialidad>/...) o por el header
+    X-Specialty; sin ninguno de los dos, el de la especialidad por defecto.
+    """
+    name = (request.view_args or {}).get("specialty") or request.headers.get("X-Specialty")
+    specialty = rag_service.specialties.get(name)
+    if specialty is None:
+        abort(404, description=f"Especialidad desconocida: {name}")
+    return asistentes[specialty.name]
+
+
+def session_key():
+    """
+    Identifica al usuario para repartir los lugares de los upstreams de forma justa.
+    """
+    return request.headers.get("X-Session-Id") or request.remote_addr
+
+
+def overloaded_response(error: OverloadedError):
+    logger.warning(f"Rejected request: {error}")
+    response = jsonify({"message": "El servicio está saturado. Por favor, intenta nuevamente en unos segundos."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
 @app.route("/", methods=["GET"])
-def home():
-    """Serve the main HTML page."""
-    return render_template("index.html")
+@app.route("/<specialty>/", methods=["GET"])
+def home(specialty=None):
+    """Serve the main HTML page (for the given specialty, if any)."""
+    current_asistente()
+    return render_template("index.html", specialty=specialty or "")
+
+@app.route("/assets/<path:name>", methods=["GET"])
+def assets(name):
+    """
+    Archivos estáticos con hash de contenido: cache inmutable de un año y variante
+    precomprimida (br/gzip) según Accept-Encoding.
+    """
+    path, entry, immutable = asset_manifest.resolve(name)
+    if entry is None:
+        abort(404)
+    encoding, variant_path = asset_manifest.variant(entry, lambda e: request.accept_encodings[e])
+    response = send_file(
+        variant_path or os.path.join(app.static_folder, path),
+        mimetype=asset_manifest.mimetype(path),
+        conditional=True,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        metrics.increment(f"assets_served_{encoding}")
+    if entry["encodings"]:
+        response.vary.add("Accept-Encoding")
+    if immutable:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.route("/erase", methods=["POST"])
-def erase():
+@app.route("/<specialty>/erase", methods=["POST"])
+def erase(specialty=None):
     """
-    Erase the last (query, response) pair from context_history.
+    Erase the last (query, response) pair from context_history, along with the summary
+    of the older turns.
     """
+    asistente = current_asistente()
     logger.debug("=== Before erase ===")
     logger.debug(json.dumps(asistente.context_history, indent=2, ensure_ascii=False))
 
-    if asistente.context_history:
-        popped = asistente.context_history.pop()
+    popped = asistente.erase_last()
+    if popped:
         logger.debug(f"Popped last item: {json.dumps(popped, ensure_ascii=False)}")
 
     logger.debug("=== After erase ===")
@@ -79,10 +182,13 @@ def feedback():
     return jsonify({"message": "¡Gracias por tu evaluación!"}), 200
 
 @app.route("/feedback_rating", methods=["POST"])
-def feedback_rating():
+@app.route("/<specialty>/feedback_rating", methods=["POST"])
+def feedback_rating(specialty=None):
     """
     Endpoint para recibir feedback de los usuarios.
     Espera un JSON con los campos: pregunta, respuesta, evaluacion, fecha, motivo.
+    La especialidad de la respuesta se guarda en `marker` (build_answer_bank.py arma
+    un banco de respuestas por especialidad).
     """
     data = request.get_json() or {}
     pregunta = data.get("pregunta", "").strip()
@@ -106,7 +212,8 @@ def feedback_rating():
         pregunta=pregunta,
         respuesta=respuesta,
         evaluacion=evaluacion,
-        motivo=motivo if evaluacion == "down" else ""
+        motivo=motivo if evaluacion == "down" else "",
+        marker=current_asistente().specialty.name
     )
 
     try:
@@ -120,17 +227,24 @@ def feedback_rating():
         return jsonify({"message": "Error interno al guardar el feedback."}), 500
 
 @app.route("/check_rag", methods=["POST"])
-def check_rag():
+@app.route("/<specialty>/check_rag", methods=["POST"])
+def check_rag(specialty=None):
     """
     Check if the user's query should use RAG (GroundX retrieval).
     """
     data = request.get_json()
     user_message = data.get("message", "")
-    rag_used = rag_service.should_call_groundx(user_message)
+    try:
+        rag_used = rag_service.should_call_groundx(
+            user_message, session_key=session_key(), specialty=current_asistente().specialty
+        )
+    except OverloadedError as e:
+        return overloaded_response(e)
     return jsonify({"is_rag": rag_used})
 
 @app.route("/chat_stream", methods=["POST"])
-def chat_stream():
+@app.route("/<specialty>/chat_stream", methods=["POST"])
+def chat_stream(specialty=None):
     """
     Streams the completion response chunk-by-chunk to the client.
     """
@@ -140,43 +254,73 @@ def chat_stream():
     if not user_message:
         return jsonify({"message": "Error: No message provided"}), 400
 
+    asistente = current_asistente()
     try:
+        stream_info = {}
+        chunks = asistente.chat_completions_stream(user_message, stream_info=stream_info, session_key=session_key())
+        # Pull the first chunk so we know whether the answer comes from the cache
+        # (and so an overloaded upstream can still be answered with a 503)
+        try:
+            first_chunk = next(chunks, None)
+        except OverloadedError as e:
+            return overloaded_response(e)
+
         def generate():
             partial_answer = []
             # Use your Asistente's streaming method
-            for chunk in asistente.chat_completions_stream(user_message):
-                partial_answer.append(chunk)
-                yield chunk
+            try:
+                answer_chunks = itertools.chain([first_chunk] if first_chunk is not None else [], chunks)
+                for chunk in stream_coalescer.coalesce(answer_chunks):
+                    partial_answer.append(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # Client disconnected: close the upstream call and skip reference processing
+                chunks.close()
+                raise
 
             # Al finalizar la recepción de chunks, unimos
             final_answer = "".join(partial_answer)
 
-            # Llamamos a reference_maker para hacer fuzzy matching en la respuesta completa
-            final_answer_with_citations = asistente.rag_service.process_references_in_text(final_answer)
+            # Resolvemos las citas de la respuesta completa: etiquetas de fuente con la tabla de
+            # procedencia del contexto y, como respaldo, fuzzy matching de los nombres en negrita
+            final_answer_with_citations = asistente.rag_service.process_references_in_text(
+                final_answer, specialty=asistente.specialty, provenance=stream_info.get("provenance")
+            )
 
             yield "\n[REF_POSTPROCESS]" + final_answer_with_citations
 
         return Response(
             stream_with_context(generate()),
-            mimetype='text/plain'  # or text/event-stream for SSE
+            mimetype='text/plain',  # or text/event-stream for SSE
+            headers={"X-Answer-Cache": stream_info.get("cache", "miss")}
         )
     except Exception as e:
         logger.error(f"Error in /chat_stream: {e}")
         return jsonify({"message": f"Error: {e}"}), 500
 
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Devuelve los contadores y latencias del proceso.
+    """
+    snapshot = metrics.snapshot()
+    snapshot["process"] = {"pid": os.getpid(), "rss_mib": round(process_rss_mib(), 1)}
+    return jsonify(snapshot)
+
+
 @app.route("/osma_init", methods=["POST"])
 def osma_init():
     """
     Inicializa la sesión OSMA creando una instancia de AsistenteOSMA.
-    Devuelve el prompt inicial y las opciones de servicios disponibles.
+    Devuelve el prompt inicial, las opciones de servicios disponibles y el id de sesión.
     """
-    global osma_assistant
     osma_assistant = AsistenteOSMA()
-    services = list(osma_assistant.data.keys())
+    session_id = osma_sessions.create(osma_assistant)
+    services = list(osma_assistant.catalog.services)
     prompt = "¿Qué servicio(s) desea seleccionar?"
-    logger.info("Se ha iniciado la sesión OSMA")
-    return jsonify({"prompt": prompt, "services": services})
+    logger.info(f"Se ha iniciado la sesión OSMA {session_id}")
+    return jsonify({"prompt": prompt, "services": services, "session_id": session_id})
 
 
 @app.route("/osma_respond", methods=["POST"])
@@ -185,33 +329,37 @@ def osma_respond():
     Procesa la respuesta del usuario en el flujo OSMA y devuelve
     el siguiente prompt y, cuando corresponda, las opciones para el siguiente formulario.
     """
-    global osma_assistant
+    data = request.get_json() or {}
+    session_id = data.get("session_id", "")
+    osma_assistant = osma_sessions.get(session_id)
     if osma_assistant is None:
         return jsonify({"error": "No se ha iniciado la sesión OSMA"}), 400
 
-    data = request.get_json()
     respuesta = data.get("respuesta", "").strip()
     if respuesta == "":
         return jsonify({"error": "Respuesta vacía"}), 400
 
     next_prompt = osma_assistant.procesar_respuesta(respuesta)
+    osma_sessions.save(session_id, osma_assistant)
 
     # Según el nuevo estado, devolvemos opciones para el próximo formulario.
     if osma_assistant.state == 1:
         # Paso 1: Monitoreables. Se agrupan de todos los servicios seleccionados.
-        monitoreables = set()
-        for serv in osma_assistant.servicio:
-            monitoreables.update(osma_assistant.data.get(serv, {}).keys())
-        return jsonify({"prompt": next_prompt, "monitoreables": list(monitoreables)})
+        monitoreables = osma_assistant.catalog.monitoreables_for(osma_assistant.servicio)
+        return jsonify({"prompt": next_prompt, "monitoreables": monitoreables})
     elif osma_assistant.state == 2:
         # Paso 2: Variables.
-        variables = set()
-        for mon in osma_assistant.monitoreable:
-            for serv in osma_assistant.servicio:
-                if mon in osma_assistant.data.get(serv, {}):
-                    for var_item in osma_assistant.data[serv][mon]:
-                        variables.add(var_item.get("Variable"))
-        return jsonify({"prompt": next_prompt, "variables": list(variables)})
+        variables = osma_assistant.catalog.variables_for(osma_assistant.servicio, osma_assistant.monitoreable)
+        return jsonify({"prompt": next_prompt, "variables": variables})
+    elif osma_assistant.state == 3 and osma_assistant.candidatos:
+        # Texto libre resuelto en un solo paso: devolvemos la selección y los candidatos
+        return jsonify({
+            "prompt": next_prompt,
+            "services": osma_assistant.servicio,
+            "monitoreables_selected": osma_assistant.monitoreable,
+            "variables_selected": osma_assistant.variables,
+            "candidatos": osma_assistant.candidatos,
+        })
     elif osma_assistant.state == 4:
         # Paso 4: Intervalo; enviamos las opciones fijas
         intervals = ["Minuto", "Hora", "Día", "Mes"]
@@ -220,8 +368,106 @@ def osma_respond():
         return jsonify({"prompt": next_prompt})
 
 
+@app.route("/osma_search", methods=["POST"])
+def osma_search():
+    """
+    Busca variables OSMA a partir de una frase libre.
+    Devuelve los candidatos ordenados (idVariable, servicio, monitoreable, variable, score).
+    """
+    data = request.get_json() or {}
+    query = data.get("query", "").strip()
+    if not query:
+        return jsonify({"error": "Consulta vacía"}), 400
+
+    search_index = OsmaCatalog.get().search_index
+    try:
+        limit = int(data.get("limit", 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "El parámetro 'limit' debe ser un entero"}), 400
+    limit = min(max(limit, 1), max(len(search_index.entries), 1))
+    candidatos = search_index.search(query, limit=limit)
+    return jsonify({"candidatos": candidatos})
+
+
+@app.route("/osma_export", methods=["POST"])
+def osma_export():
+    """
+    Exporta en streaming las series de todas las variables seleccionadas en una sesión OSMA
+    finalizada. Espera un JSON con 'session_id' y opcionalmente 'format' ("csv" o "parquet").
+    """
+    data = request.get_json() or {}
+    osma_assistant = osma_sessions.get(data.get("session_id", ""))
+    if osma_assistant is None:
+        return jsonify({"error": "No se ha iniciado la sesión OSMA"}), 400
+    if osma_assistant.state < len(osma_assistant.preguntas):
+        return jsonify({"error": "El diálogo OSMA no ha finalizado"}), 400
+
+    export_format = data.get("format", "csv").lower()
+    if export_format not in OsmaExporter.FORMATS:
+        return jsonify({"error": f"Formato no soportado: {export_format}"}), 400
+    if export_format == "parquet" and not OsmaExporter.parquet_available():
+        return jsonify({"error": "La exportación Parquet no está disponible en este servidor"}), 501
+
+    variables = osma_assistant.variables_seleccionadas()
+    if not variables:
+        return jsonify({"error": "No hay variables válidas seleccionadas"}), 400
+
+    try:
+        fecha_inicio, fecha_fin = osma_assistant.fechas()
+        exporter = OsmaExporter.from_env()
+    except Exception as e:
+        logger.error(f"Error al preparar la exportación OSMA: {e}")
+        return jsonify({"error": f"Error: {e}"}), 500
+
+    interval = osma_assistant.intervalo_api()
+    if export_format == "csv":
+        body = exporter.iter_csv(variables, fecha_inicio, fecha_fin, interval)
+        mimetype = "text/csv"
+    else:
+        body = exporter.iter_parquet(variables, fecha_inicio, fecha_fin, interval)
+        mimetype = "application/vnd.apache.parquet"
+
+    logger.info(f"Exportando {len(variables)} variable(s) OSMA en formato {export_format}")
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=osma_export.{export_format}"}
+    )
+
+
+@app.route("/osma_summary", methods=["POST"])
+def osma_summary():
+    """
+    Devuelve un resumen de tamaño acotado de cada variable de una sesión OSMA finalizada,
+    pensado para incluirse en el prompt del asistente.
+    """
+    data = request.get_json() or {}
+    osma_assistant = osma_sessions.get(data.get("session_id", ""))
+    if osma_assistant is None:
+        return jsonify({"error": "No se ha iniciado la sesión OSMA"}), 400
+    if osma_assistant.state < len(osma_assistant.preguntas):
+        return jsonify({"error": "El diálogo OSMA no ha finalizado"}), 400
+
+    try:
+        fecha_inicio, fecha_fin = osma_assistant.fechas()
+        osma = OsmaExporter.from_env().osma
+        resumenes = [
+            osma_summarizer.summarize_variable(
+                osma, var["idVariable"], fecha_inicio, fecha_fin, osma_assistant.intervalo_api(),
+                nombre=f"{var['servicio']} / {var['monitoreable']} / {var['variable']}"
+            )
+            for var in osma_assistant.variables_seleccionadas()
+        ]
+    except Exception as e:
+        logger.error(f"Error al resumir los datos OSMA: {e}")
+        return jsonify({"error": f"Error: {e}"}), 500
+
+    return jsonify({"resumen": "\n\n".join(resumenes)})
+
+
 @app.route("/process_references", methods=["POST"])
-def process_references():
+@app.route("/<specialty>/process_references", methods=["POST"])
+def process_references(specialty=None):
     """
     Endpoint para procesar referencias en el texto completo de la respuesta.
     Espera un JSON con el campo 'text'.
@@ -234,8 +480,9 @@ def process_references():
         logger.warning("No se proporcionó texto para procesar referencias.")
         return jsonify({"message": "Error: No se proporcionó texto."}), 400
 
+    specialty = current_asistente().specialty
     try:
-        processed_text = rag_service.process_references_in_text(text)
+        processed_text = rag_service.process_references_in_text(text, specialty=specialty)
         logger.info("Referencias procesadas exitosamente.")
         return jsonify({"processed_text": processed_text}), 200
     except Exception as e:
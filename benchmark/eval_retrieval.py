@@ -0,0 +1,286 @@
+# benchmark/eval_retrieval.py
+"""
+Evaluación offline de la recuperación en GroundX.
+
+Arma un conjunto etiquetado con las filas de Feedback votadas "up" cuyas respuestas citan
+documentos (**archivo.pdf** o el bloque "Referencias:") y repite la recuperación de cada
+pregunta con distintas profundidades (n), variantes de consulta (sólo español, sólo
+inglés, ambas) y estrategias de fusión. Para cada configuración informa el recall de los
+documentos citados, los tokens de contexto y la latencia de recuperación, y señala la
+configuración más barata que mantiene el recall.
+
+    python -m benchmark.eval_retrieval --feedback feedback.json --depths 3,5,10,20
+    python -m benchmark.eval_retrieval --specialty cafe --variants both --merges concat,rrf
+
+Las búsquedas y traducciones se guardan en --cache, de modo que repetir la evaluación
+(o agregar estrategias de fusión) no vuelve a llamar a las APIs.
+"""
+import os
+import re
+import json
+import time
+import argparse
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from rapidfuzz import fuzz
+
+from classes.RAG import RAGService
+from classes.answer_cache import normalize_question
+from classes.reference_maker import ReferenceMaker
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BOLD_REFERENCE = re.compile(r"\*\*([^*]+)\*\*")
+LISTED_REFERENCE = re.compile(r"^\s*\[\d+\]\s*(.+?)\s*$", re.MULTILINE)
+DOCUMENT_SUFFIX = re.compile(r"\.(pdf|docx?|txt)", re.IGNORECASE)
+RRF_K = 60
+
+
+def normalize_document(name: str) -> str:
+    return ReferenceMaker.normalize_reference_name(name).strip().lower()
+
+
+def cited_documents(answer: str) -> set:
+    """
+    Documentos citados en una respuesta: nombres en negrita con extensión de archivo y
+    entradas [n] del bloque de referencias.
+    """
+    names = [m for m in BOLD_REFERENCE.findall(answer) if DOCUMENT_SUFFIX.search(m)]
+    names += [m for m in LISTED_REFERENCE.findall(answer) if DOCUMENT_SUFFIX.search(m)]
+    return {normalize_document(name) for name in names}
+
+
+def build_labeled_set(rows) -> list:
+    """
+    Preguntas únicas (normalizadas) de feedback "up" con al menos un documento citado.
+    """
+    labeled = {}
+    for row in rows:
+        if row.get("evaluacion") != "up":
+            continue
+        cited = cited_documents(row.get("respuesta", ""))
+        if not cited:
+            continue
+        key = normalize_question(row["pregunta"])
+        item = labeled.setdefault(key, {"id": row["id"], "question": row["pregunta"].strip(), "cited": set()})
+        item["cited"] |= cited
+    return [dict(item, cited=sorted(item["cited"])) for item in labeled.values()]
+
+
+def estimate_tokens(text: str) -> int:
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    except ImportError:
+        return len(text) // 4  # aproximación habitual para texto en español/inglés
+
+
+class CallCache:
+    """
+    Resultados de búsquedas y traducciones guardados en un archivo JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def get_or_call(self, key: str, fn):
+        with self._lock:
+            if key in self.entries:
+                return self.entries[key]
+        value = fn()
+        with self._lock:
+            self.entries[key] = value
+        return value
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class RetrievalEvaluator:
+    def __init__(self, rag: RAGService, specialty, cache: CallCache, match_threshold: int = 85):
+        self.rag = rag
+        self.specialty = specialty
+        self.cache = cache
+        self.match_threshold = match_threshold
+
+    def translate(self, question: str) -> str:
+        return self.cache.get_or_call(
+            f"translate|{question}", lambda: self.rag.translate_spanish_to_english(question)
+        )
+
+    def search(self, query: str, n: int) -> dict:
+        """
+        Una búsqueda con profundidad n: latencia y fragmentos (documento, id, texto).
+        """
+        def call():
+            start = time.monotonic()
+            response = self.rag.groundx.search.content(id=self.specialty.bucket_id, n=n, query=query)
+            latency = time.monotonic() - start
+            chunks = [
+                {
+                    "id": r.chunk_id or f"{r.document_id}:{i}",
+                    "doc": normalize_document(r.file_name or ""),
+                    "text": r.suggested_text or r.text or "",
+                }
+                for i, r in enumerate(response.search.results or [])
+            ]
+            return {"latency": latency, "chunks": chunks}
+
+        return self.cache.get_or_call(f"search|{self.specialty.bucket_id}|{n}|{query}", call)
+
+    @staticmethod
+    def merge(result_lists: list, strategy: str, n: int) -> list:
+        if len(result_lists) == 1 or strategy == "concat":
+            # Lo que hace la aplicación: todos los fragmentos de cada búsqueda, uno tras otro
+            return [chunk for chunks in result_lists for chunk in chunks]
+        if strategy == "interleave":
+            merged, seen = [], set()
+            for rank in range(max(len(chunks) for chunks in result_lists)):
+                for chunks in result_lists:
+                    if rank < len(chunks) and chunks[rank]["id"] not in seen:
+                        seen.add(chunks[rank]["id"])
+                        merged.append(chunks[rank])
+            return merged[:n]
+        if strategy == "rrf":
+            scores, by_id = {}, {}
+            for chunks in result_lists:
+                for rank, chunk in enumerate(chunks):
+                    scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+                    by_id[chunk["id"]] = chunk
+            ranked = sorted(scores, key=scores.get, reverse=True)
+            return [by_id[chunk_id] for chunk_id in ranked[:n]]
+        raise ValueError(f"Unknown merge strategy '{strategy}'")
+
+    def recall(self, cited: list, chunks: list) -> float:
+        retrieved = {chunk["doc"] for chunk in chunks if chunk["doc"]}
+        found = sum(
+            1 for doc in cited
+            if any(fuzz.ratio(doc, name) >= self.match_threshold for name in retrieved)
+        )
+        return found / len(cited)
+
+    def evaluate(self, item: dict, depth: int, variant: str, strategy: str) -> dict:
+        queries = []
+        if variant in ("es", "both"):
+            queries.append(item["question"])
+        if variant in ("en", "both"):
+            queries.append(self.translate(item["question"]))
+        searches = [self.search(query, depth) for query in queries]
+        chunks = self.merge([s["chunks"] for s in searches], strategy, depth)
+        return {
+            "recall": self.recall(item["cited"], chunks),
+            "tokens": estimate_tokens("\n".join(chunk["text"] for chunk in chunks)),
+            "chunks": len(chunks),
+            "latency": max(s["latency"] for s in searches),  # las búsquedas corren en paralelo
+        }
+
+
+def configurations(depths: list, variants: list, merges: list):
+    for variant in variants:
+        for strategy in (merges if variant == "both" else ["single"]):
+            for depth in depths:
+                yield depth, variant, strategy
+
+
+def summarize(rows: list) -> dict:
+    latencies = sorted(r["latency"] for r in rows)
+    return {
+        "recall": sum(r["recall"] for r in rows) / len(rows),
+        "hit_rate": sum(1 for r in rows if r["recall"] > 0) / len(rows),
+        "tokens": sum(r["tokens"] for r in rows) / len(rows),
+        "chunks": sum(r["chunks"] for r in rows) / len(rows),
+        "latency_p50": latencies[int(0.50 * (len(latencies) - 1))],
+        "latency_p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feedback", default=None, help="feedback.json export (default: read DATABASE_URL)")
+    parser.add_argument("--specialty", default=None, help="Specialty whose bucket is searched")
+    parser.add_argument("--depths", default="3,5,10,15,20")
+    parser.add_argument("--variants", default="es,en,both")
+    parser.add_argument("--merges", default="concat,interleave,rrf", help="Fusion strategies for 'both'")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Recall loss accepted for a cheaper config")
+    parser.add_argument("--cache", default=os.path.join(PROJECT_ROOT, "benchmark_results", "retrieval_cache.json"))
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    if args.feedback:
+        with open(args.feedback, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        from build_answer_bank import read_feedback_from_db
+        rows = read_feedback_from_db(0)
+    labeled = build_labeled_set(rows)[:args.limit]
+    if not labeled:
+        parser.error("No up-voted feedback with cited documents found")
+
+    rag = RAGService()
+    specialty = rag.specialties.get(args.specialty)
+    if specialty is None:
+        parser.error(f"Unknown specialty '{args.specialty}'")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.cache)), exist_ok=True)
+    cache = CallCache(args.cache)
+    evaluator = RetrievalEvaluator(rag, specialty, cache)
+    depths = [int(d) for d in args.depths.split(",")]
+    configs = list(configurations(depths, args.variants.split(","), args.merges.split(",")))
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for depth, variant, strategy in configs:
+                rows = list(pool.map(lambda item: evaluator.evaluate(item, depth, variant, strategy), labeled))
+                results.append({"depth": depth, "variant": variant, "merge": strategy, **summarize(rows)})
+    finally:
+        cache.save()
+
+    best_recall = max(r["recall"] for r in results)
+    eligible = [r for r in results if r["recall"] >= best_recall - args.tolerance]
+    cheapest = min(eligible, key=lambda r: (r["tokens"], r["latency_p50"]))
+
+    print(f"\n{len(labeled)} labeled questions, specialty '{specialty.name}'\n")
+    print(f"{'variant':<8}{'merge':<12}{'n':>4}{'recall':>9}{'hit':>7}{'tokens':>9}{'chunks':>8}{'p50 s':>8}{'p95 s':>8}")
+    for r in sorted(results, key=lambda r: (-r["recall"], r["tokens"])):
+        marker = "  <= cheapest" if r is cheapest else ""
+        print(f"{r['variant']:<8}{r['merge']:<12}{r['depth']:>4}{r['recall']:>9.3f}{r['hit_rate']:>7.2f}"
+              f"{r['tokens']:>9.0f}{r['chunks']:>8.1f}{r['latency_p50']:>8.2f}{r['latency_p95']:>8.2f}{marker}")
+
+    output = args.output or os.path.join(
+        PROJECT_ROOT, "benchmark_results", f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "specialty": specialty.name,
+            "questions": labeled,
+            "results": results,
+            "cheapest": cheapest,
+            "tolerance": args.tolerance,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
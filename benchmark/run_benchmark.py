@@ -0,0 +1,314 @@
+# benchmark/run_benchmark.py
+"""
+Benchmark de extremo a extremo: levanta los stand-ins de OpenAI y GroundX, arranca la
+aplicación con gunicorn apuntando a ellos y reproduce las preguntas de feedback.json
+contra /check_rag y /chat_stream con la concurrencia indicada.
+
+El resultado (TTFT, latencia total, throughput, memoria por worker y la configuración
+usada) se guarda como JSON en benchmark_results/ para poder comparar corridas:
+
+    python -m benchmark.run_benchmark --concurrency 8 --limit 100
+    python -m benchmark.run_benchmark --mode record --recording rec.jsonl   # usa las APIs reales
+    python -m benchmark.run_benchmark --mode replay --recording rec.jsonl --baseline benchmark_results/anterior.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import logging
+import subprocess
+import http.client
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark.standins import Latency, Recording, StandInServer, OpenAIHandler, GroundXHandler
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def percentiles(values: list) -> dict:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": values[int(0.50 * (len(values) - 1))],
+        "p95": values[int(0.95 * (len(values) - 1))],
+        "p99": values[int(0.99 * (len(values) - 1))],
+        "max": values[-1],
+    }
+
+
+def load_questions(path: str, limit: int = None) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    questions = [row["pregunta"].strip() for row in rows if row.get("pregunta", "").strip()]
+    return questions[:limit] if limit else questions
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_memory(master_pid: int) -> list:
+    """
+    RSS actual y pico (KiB) de cada worker de gunicorn, leídos de /proc (sólo Linux).
+    """
+    workers = []
+    try:
+        children = open(f"/proc/{master_pid}/task/{master_pid}/children").read().split()
+    except OSError:
+        return workers
+    for pid in children:
+        status = {}
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    status[name] = value.strip()
+        except OSError:
+            continue
+        workers.append({
+            "pid": int(pid),
+            "rss_kib": int(status.get("VmRSS", "0 kB").split()[0]),
+            "peak_rss_kib": int(status.get("VmHWM", "0 kB").split()[0]),
+        })
+    return workers
+
+
+class AppProcess:
+    """
+    La aplicación bajo gunicorn, configurada para usar los stand-ins.
+    """
+
+    def __init__(self, workers: int, threads: int, env: dict):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{self.port}", "--timeout", "300", "app:app"],
+            cwd=PROJECT_ROOT,
+            # Por gunicorn.conf.py, como en producción: los límites del governor dependen de los hilos
+            env={**os.environ, **env, "GUNICORN_WORKERS": str(workers), "GUNICORN_THREADS": str(threads)},
+        )
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"The app exited during startup (code {self.process.returncode})")
+            try:
+                urllib.request.urlopen(self.url + "/metrics", timeout=2).read()
+                return
+            except OSError:
+                time.sleep(0.5)
+        raise RuntimeError("The app did not become ready in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def post(app_url: str, path: str, payload: dict, session_id: str):
+    """
+    POST que mide el tiempo hasta el primer byte del cuerpo y el total.
+    Devuelve (status, ttft, total, bytes).
+    """
+    host, port = app_url.split("//", 1)[1].split(":")
+    conn = http.client.HTTPConnection(host, int(port), timeout=300)
+    body = json.dumps(payload).encode("utf-8")
+    start = time.monotonic()
+    try:
+        conn.request("POST", path, body=body, headers={"Content-Type": "application/json", "X-Session-Id": session_id})
+        response = conn.getresponse()
+        ttft = None
+        size = 0
+        while True:
+            data = response.read1(65536)
+            if not data:
+                break
+            if ttft is None:
+                ttft = time.monotonic() - start
+            size += len(data)
+        total = time.monotonic() - start
+        return response.status, ttft if ttft is not None else total, total, size
+    finally:
+        conn.close()
+
+
+def run_load(app_url: str, questions: list, concurrency: int) -> dict:
+    """
+    Cada usuario simulado (un hilo, con su propio X-Session-Id) hace /check_rag y luego
+    /chat_stream con la siguiente pregunta de la lista.
+    """
+    samples = {"check_rag": [], "chat_stream_ttft": [], "chat_stream_total": []}
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+
+    def count(name: str):
+        with lock:
+            statuses[name] = statuses.get(name, 0) + 1
+
+    def one(index: int):
+        question = questions[index]
+        session_id = f"bench-{index % concurrency}"
+        try:
+            status, _, total, _ = post(app_url, "/check_rag", {"message": question}, session_id)
+            count(f"check_rag:{status}")
+            if status == 200:
+                samples["check_rag"].append(total)
+            status, ttft, total, _ = post(app_url, "/chat_stream", {"message": question}, session_id)
+            count(f"chat_stream:{status}")
+            if status == 200:
+                samples["chat_stream_ttft"].append(ttft)
+                samples["chat_stream_total"].append(total)
+        except Exception as e:
+            errors.append(str(e))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(questions))))
+    elapsed = time.monotonic() - start
+
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples["chat_stream_total"]) / elapsed if elapsed else 0,
+        "check_rag": percentiles(samples["check_rag"]),
+        "chat_stream_ttft": percentiles(samples["chat_stream_ttft"]),
+        "chat_stream_total": percentiles(samples["chat_stream_total"]),
+        "statuses": statuses,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+    }
+
+
+def print_report(report: dict, baseline: dict = None):
+    results = report["results"]
+    print(f"\n{len(report['config']['questions'])} questions, concurrency {report['config']['concurrency']}, "
+          f"{results['elapsed_s']:.1f}s, {results['throughput_rps']:.2f} answers/s, {results['errors']} errors")
+    for name in ("check_rag", "chat_stream_ttft", "chat_stream_total"):
+        stats = results[name]
+        if not stats:
+            continue
+        line = f"{name:<18} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s"
+        old = (baseline or {}).get("results", {}).get(name)
+        if old:
+            line += f"   (p50 {stats['p50'] - old['p50']:+.3f}s, p95 {stats['p95'] - old['p95']:+.3f}s)"
+        print(line)
+    for worker in report["workers"]:
+        print(f"worker {worker['pid']}: rss={worker['rss_kib'] / 1024:.0f} MiB peak={worker['peak_rss_kib'] / 1024:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=os.path.join(PROJECT_ROOT, "feedback.json"))
+    parser.add_argument("--limit", type=int, default=None, help="Number of questions to replay")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--app-url", default=None, help="Use an app that is already running instead of starting one")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--mode", choices=("synthetic", "record", "replay"), default="synthetic")
+    parser.add_argument("--recording", default=None, help="JSONL file for record/replay")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Speed-up factor for replayed timings")
+    parser.add_argument("--openai-latency", default="lognormal:600:0.5", help="Time to first token (ms)")
+    parser.add_argument("--groundx-latency", default="lognormal:900:0.4", help="Search latency (ms)")
+    parser.add_argument("--token-rate", type=float, default=60, help="Streamed tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=250)
+    parser.add_argument("--context-chars", type=int, default=6000, help="Size of the synthetic GroundX context")
+    parser.add_argument("--rag-probability", type=int, default=80, help="Classifier answer (0-100)")
+    parser.add_argument("--output", default=None, help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    if args.mode != "synthetic" and not args.recording:
+        parser.error("--recording is required with --mode record/replay")
+
+    config = {
+        "mode": args.mode,
+        "recording": Recording(args.recording) if args.recording else None,
+        "replay_speed": args.replay_speed,
+        "replay_misses": 0,
+        "openai_latency": Latency(args.openai_latency),
+        "groundx_latency": Latency(args.groundx_latency),
+        "token_rate": args.token_rate,
+        "answer_tokens": args.answer_tokens,
+        "context_chars": args.context_chars,
+        "rag_probability": args.rag_probability,
+    }
+    questions = load_questions(args.questions, args.limit)
+
+    openai_server = StandInServer(OpenAIHandler, config).start()
+    groundx_server = StandInServer(GroundXHandler, config).start()
+    app = None
+    try:
+        app_url = args.app_url
+        if app_url is None:
+            env = {
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_server.port}/v1",
+                "GROUNDX_BASE_URL": f"http://127.0.0.1:{groundx_server.port}/api",
+                "GROUNDX_BUCKET_ID_SPANISH": os.getenv("GROUNDX_BUCKET_ID_SPANISH", "1"),
+                "DATABASE_URL": os.getenv("DATABASE_URL", "sqlite://"),
+            }
+            if args.mode != "record":
+                env.update({"OPENAI_API_KEY": "stand-in", "GROUNDX_API_KEY": "stand-in"})
+            app = AppProcess(args.workers, args.threads, env)
+            app.wait_ready()
+            app_url = app.url
+
+        results = run_load(app_url, questions, args.concurrency)
+        workers = worker_memory(app.process.pid) if app else []
+    finally:
+        if app:
+            app.stop()
+        openai_server.stop()
+        groundx_server.stop()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "questions": questions,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "threads": args.threads,
+            "mode": args.mode,
+            "openai_latency": args.openai_latency,
+            "groundx_latency": args.groundx_latency,
+            "token_rate": args.token_rate,
+            "answer_tokens": args.answer_tokens,
+            "context_chars": args.context_chars,
+            "replay_misses": config["replay_misses"],
+        },
+        "results": results,
+        "workers": workers,
+    }
+
+    output = args.output or os.path.join(
+        PROJECT_ROOT, "benchmark_results", f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# benchmark/standins.py
+"""
+Servidores locales que imitan las APIs de OpenAI (chat completions, con y sin stream)
+y de GroundX (search.content) para medir la aplicación sin llamar a los servicios pagos.
+
+Modos:
+    synthetic  respuestas generadas con latencias aleatorias configurables.
+    record     reenvía cada petición al servicio real y guarda la respuesta (con sus tiempos).
+    replay     responde con lo grabado; si una petición no fue grabada, usa la respuesta sintética.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import parse_qs, urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+OPENAI_UPSTREAM = "https://api.openai.com/v1"
+GROUNDX_UPSTREAM = "https://api.groundx.ai/api"
+
+FILLER = (
+    "La neumonía adquirida en la comunidad se trata según la gravedad y los factores de riesgo del paciente. "
+    "En pacientes ambulatorios sin comorbilidades se recomienda amoxicilina; ante alergia, un macrólido. "
+    "Los pacientes hospitalizados requieren cobertura para gérmenes atípicos y evaluación de la respuesta a las 72 horas. "
+)
+
+
+class Latency:
+    """
+    Distribución de latencia en milisegundos a partir de una especificación de texto:
+    "fixed:800", "uniform:200:900" o "lognormal:800:0.5" (mediana y sigma).
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(*self.params)
+        else:
+            median, sigma = self.params
+            ms = random.lognormvariate(0, sigma) * median
+        return ms / 1000
+
+
+class Recording:
+    """
+    Respuestas grabadas en un archivo JSONL: una línea por petición con la clave
+    (hash de la ruta y el cuerpo) y los fragmentos recibidos con su demora relativa.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(path: str, body: bytes) -> str:
+        try:
+            canonical = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            canonical = body.decode("utf-8", errors="replace")
+        return hashlib.sha256(f"{path}\0{canonical}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def add(self, key: str, status: int, content_type: str, parts: list):
+        entry = {"key": key, "status": status, "content_type": content_type, "parts": parts}
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Base de los dos stand-ins: resuelve el modo (grabar, reproducir o sintético) y delega
+    la respuesta sintética en `synthetic()`.
+    """
+    upstream = None
+    config = None  # dict con mode, recording, latencias, etc. (lo asigna StandInServer)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        mode = self.config["mode"]
+        recording = self.config.get("recording")
+        key = Recording.key(self.path, body)
+
+        if mode == "record":
+            return self.proxy(body, key, recording)
+        if mode == "replay" and recording is not None:
+            entry = recording.get(key)
+            if entry is not None:
+                return self.replay(entry)
+            self.config["replay_misses"] += 1
+        return self.synthetic(json.loads(body or b"{}"))
+
+    def proxy(self, body: bytes, key: str, recording: Recording):
+        headers = {"Content-Type": "application/json"}
+        for name in ("Authorization", "X-API-Key"):
+            if self.headers.get(name):
+                headers[name] = self.headers[name]
+        request = urllib.request.Request(self.upstream + self.path_suffix(), data=body, headers=headers, method="POST")
+        parts = []
+        start = last = time.monotonic()
+        try:
+            upstream = urllib.request.urlopen(request, timeout=120)
+        except urllib.error.HTTPError as e:
+            upstream = e
+        status = getattr(upstream, "status", None) or upstream.code
+        content_type = upstream.headers.get("Content-Type", "application/json")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        while True:
+            data = upstream.readline()
+            if not data:
+                break
+            now = time.monotonic()
+            parts.append([round(now - last, 4), data.decode("utf-8", errors="replace")])
+            last = now
+            self.wfile.write(data)
+            self.wfile.flush()
+        logger.info(f"Recorded {self.path} in {time.monotonic() - start:.2f}s")
+        recording.add(key, status, content_type, parts)
+
+    def path_suffix(self) -> str:
+        return self.path
+
+    def replay(self, entry: dict):
+        self.send_response(entry["status"])
+        self.send_header("Content-Type", entry["content_type"])
+        self.end_headers()
+        speed = self.config.get("replay_speed", 1.0)
+        for delay, data in entry["parts"]:
+            if delay and speed:
+                time.sleep(delay / speed)
+            self.wfile.write(data.encode("utf-8"))
+            self.wfile.flush()
+
+    def send_json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def synthetic(self, body: dict):
+        # Las subclases generan la respuesta de su API; sin una, la ruta no existe
+        self.send_json({"error": f"No synthetic response for {self.path}"}, status=404)
+
+
+class OpenAIHandler(StandInHandler):
+    """
+    POST /v1/chat/completions. Las peticiones del clasificador devuelven una probabilidad,
+    las del traductor devuelven el texto de entrada y el resto genera una respuesta de
+    `answer_tokens` palabras a `token_rate` tokens por segundo.
+    """
+    upstream = OPENAI_UPSTREAM
+
+    def path_suffix(self) -> str:
+        return self.path[len("/v1"):] if self.path.startswith("/v1") else self.path
+
+    def synthetic(self, body: dict):
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        last = messages[-1]["content"] if messages else ""
+        model = body.get("model", "stand-in")
+
+        time.sleep(self.config["openai_latency"].sample())
+        if "classifier" in system:
+            return self.send_json(self.completion(model, str(self.config["rag_probability"])))
+        if "translator" in system:
+            text = last.split("Text to translate:", 1)[-1].strip()
+            return self.send_json(self.completion(model, text))
+
+        words = (FILLER * 20).split()[:self.config["answer_tokens"]]
+        if not body.get("stream"):
+            return self.send_json(self.completion(model, " ".join(words)))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        delay = 1.0 / self.config["token_rate"]
+        for word in words:
+            self.sse(self.chunk(model, {"content": word + " "}))
+            time.sleep(delay)
+        self.sse(self.chunk(model, {}, finish_reason="stop"))
+        if body.get("stream_options", {}).get("include_usage"):
+            usage = self.chunk(model, None)
+            usage["usage"] = self.usage(last, words)
+            self.sse(usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def sse(self, payload: dict):
+        self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    @staticmethod
+    def usage(prompt: str, words: list) -> dict:
+        prompt_tokens = len(prompt.split())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+    def completion(self, model: str, content: str) -> dict:
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": self.usage(content, content.split()),
+        }
+
+    @staticmethod
+    def chunk(model: str, delta, finish_reason=None) -> dict:
+        choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+        }
+
+
+class GroundXHandler(StandInHandler):
+    """
+    POST /api/v1/search/{id}: devuelve `context_chars` caracteres de contexto.
+    """
+    upstream = GROUNDX_UPSTREAM
+
+    def path_suffix(self) -> str:
+        return self.path[len("/api"):] if self.path.startswith("/api") else self.path
+
+    def synthetic(self, body: dict):
+        time.sleep(self.config["groundx_latency"].sample())
+        text = (FILLER * (self.config["context_chars"] // len(FILLER) + 1))[:self.config["context_chars"]]
+        n = int(parse_qs(urlsplit(self.path).query).get("n", [10])[0])  # n viaja en la query string
+        chunk_size = max(1, len(text) // n)
+        results = [
+            {
+                "chunkId": f"chunk-{i}",
+                "documentId": f"doc-{i % 3}",
+                "fileName": f"stand-in-{i % 3}.pdf",
+                "score": 1.0 - i / n,
+                "text": text[i * chunk_size:(i + 1) * chunk_size],
+            }
+            for i in range(n)
+        ]
+        self.send_json({
+            "search": {
+                "count": n,
+                "query": body.get("query", ""),
+                "score": 0.8,
+                "text": text,
+                "results": results,
+            }
+        })
+
+
+class StandInServer:
+    """
+    Servidor en un hilo de fondo en 127.0.0.1 (puerto libre si port=0).
+    """
+
+    def __init__(self, handler, config: dict, port: int = 0):
+        handler_class = type(handler.__name__, (handler,), {"config": config})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
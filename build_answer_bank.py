@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from classes.answer_bank import AnswerBankBuilder
+from classes.specialty import SpecialtyRegistry
+
+# Load environment variables
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+def read_feedback_from_db(last_id):
+    """
+    Read feedback rows newer than last_id from the `feedback` table.
+    """
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as connection:
+        query = text("SELECT id, pregunta, respuesta, evaluacion, marker FROM feedback WHERE id > :last_id ORDER BY id;")
+        result = connection.execute(query, {"last_id": last_id})
+        return [dict(row._mapping) for row in result]
+
+
+def read_feedback_from_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    # Usage: python build_answer_bank.py [--specialty NAME] [--output answer_bank.json] [feedback.json]
+    # Without a feedback file, new rows are read from DATABASE_URL.
+    parser = argparse.ArgumentParser(description="Build the curated answer bank of a specialty from feedback.")
+    parser.add_argument("feedback", nargs="?", default=None, help="feedback.json export instead of the database")
+    parser.add_argument("--specialty", default=None, help="Specialty name (default: the registry's default)")
+    parser.add_argument("--output", default=None, help="Answer bank path (default: the specialty's answer bank)")
+    args = parser.parse_args()
+
+    try:
+        registry = SpecialtyRegistry.load(int(os.getenv("GROUNDX_BUCKET_ID_SPANISH") or 0))
+        specialty = registry.get(args.specialty)
+        if specialty is None:
+            raise ValueError(f"Unknown specialty '{args.specialty}'")
+        builder = AnswerBankBuilder(
+            bank_path=args.output or specialty.answer_bank_path,
+            specialty=specialty.name,
+            include_unmarked=specialty is registry.default,
+        )
+        if args.feedback:
+            rows = read_feedback_from_json(args.feedback)
+        else:
+            rows = read_feedback_from_db(builder.load().get("last_feedback_id", 0))
+        bank = builder.update(rows)
+        print(f"Answer bank for '{specialty.name}' updated in {builder.bank_path}: "
+              f"{len(bank['clusters'])} clusters, last feedback id {bank['last_feedback_id']}")
+    except Exception as e:
+        print(f"Error while building the answer bank: {e}")
+        sys.exit(1)
@@ -0,0 +1,21 @@
+import os
+import logging
+import sys
+
+from classes.static_assets import AssetBuilder, brotli
+
+
+if __name__ == "__main__":
+    # Usage: python build_assets.py [build_dir]
+    # Run on every deploy, before starting gunicorn. Without a build dir, ASSET_BUILD_DIR
+    # (or static_build/) is used.
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    builder = AssetBuilder(build_dir=sys.argv[1] if len(sys.argv) > 1 else None)
+    try:
+        manifest = builder.build()
+        compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+        print(f"Assets built in {os.path.abspath(builder.build_dir)}: {len(manifest)} files, {compressed} with compressed variants"
+              + ("" if brotli else " (brotli not installed, gzip only)"))
+    except Exception as e:
+        print(f"Error while building the assets: {e}")
+        sys.exit(1)
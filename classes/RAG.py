@@ -2,9 +2,14 @@ import os
 import json
 import time
 import logging
-from groundx import GroundX
-from openai import OpenAI
-from classes.reference_maker import ReferenceMaker
+from classes.specialty import SpecialtyRegistry
+from classes.clients import openai_client, groundx_client
+from classes.governor import openai_governor, groundx_governor, OverloadedError
+from classes.hedged_search import HedgedExecutor
+from classes.circuit_breaker import CircuitBreaker, CircuitOpenError
+from classes.answer_cache import normalize_question
+from classes.shared_cache import SharedCache
+from classes.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -46,118 +51,244 @@ class RAGService:
         self.bucket_id_spanish = int(self.bucket_id_spanish)
         #self.bucket_id_english = int(self.bucket_id_english)
 
-        # 2) Initialize GroundX
-        self.groundx = GroundX(api_key=self.groundx_api_key)
+        # 2) GroundX and OpenAI clients are created lazily (see the properties below)
+        self.search_executor = HedgedExecutor("groundx", governor=groundx_governor)
 
-        # 3) Store an OpenAI client if you want classification & translation
-        self.client = OpenAI(api_key=self.openai_api_key)
+        # Circuit breakers por upstream
+        self.breakers = {
+            "groundx": CircuitBreaker("groundx"),
+            "classifier": CircuitBreaker("classifier"),
+            "translator": CircuitBreaker("translator"),
+        }
 
-        # 4) Load coffee keywords
-        self.coffee_keywords = self.load_coffee_keywords("kw.txt")
+        # 3) Caché compartida por los workers del host: traducciones, clasificaciones y
+        # último contexto bueno por consulta (modo degradado). TTL en segundos.
+        shared_cache = SharedCache.get()
+        self.translations = shared_cache.namespace("translation", 7 * 24 * 3600)
+        self.classifications = shared_cache.namespace("classification", 24 * 3600)
+        self.contexts = shared_cache.namespace("retrieval", 24 * 3600)
 
-        # 5) Inicializar ReferenceMaker
-        docs_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static", "docs")
-        self.reference_maker = ReferenceMaker(docs_directory=docs_directory, threshold=70)
+        # 4) Specialties: keywords, instructions, bucket and document catalog of each one
+        self.specialties = SpecialtyRegistry.load(default_bucket_id=self.bucket_id_spanish)
 
+    @property
+    def groundx(self):
+        return groundx_client(self.groundx_api_key)
 
-    def load_coffee_keywords(self, filename: str):
+    @property
+    def client(self):
+        # OpenAI client for classification & translation, shared with Asistente
+        return openai_client(self.openai_api_key)
 
-        # Get the root directory of the project
-        project_root = os.path.dirname(os.path.abspath(__file__))  # Path to this script
-        project_root = os.path.join(project_root, "..")  # Go one level up to the root
-        file_path = os.path.join(project_root, filename)
+    def open_circuits(self) -> list:
+        """
+        Nombres de los upstreams cuyo circuito está abierto en este momento.
+        """
+        return [name for name, breaker in self.breakers.items() if breaker.is_open()]
 
-        keywords = []
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    # Ignore empty lines or comment lines
-                    if not line or line.startswith("#"):
-                        continue
-                    keywords.append(line.lower())
-        except FileNotFoundError:
-            logger.warning(f"Could not find {filename}, defaulting to empty keyword list.")
-        return keywords
-
-    def should_call_groundx(self, query: str) -> bool:
-        """
-        Checks if the query has infectologia-related keywords or if a separate classification
-        says it's about infectologia above a probability threshold.
+    def cached_context(self, query: str, specialty=None):
+        """
+        Último contexto bueno para la consulta como (texto, procedencia), o None.
+        """
+        key = f"{(specialty or self.specialties.default).name}|{normalize_question(query)}"
+        cached = self.contexts.get(key)
+        if isinstance(cached, str):  # entradas guardadas antes de la tabla de procedencia
+            return cached, {}
+        return (cached["text"], cached["provenance"]) if cached else None
+
+    def _remember_context(self, query: str, context: str, provenance: dict, specialty=None):
+        key = f"{(specialty or self.specialties.default).name}|{normalize_question(query)}"
+        self.contexts.set(key, {"text": context, "provenance": provenance})
+
+    def should_call_groundx(self, query: str, session_key=None, specialty=None) -> bool:
+        """
+        Checks if the query has keywords of the specialty (infectologia by default) or if a
+        separate classification says it's about its topic above a probability threshold.
         """
+        specialty = specialty or self.specialties.default
+        topic = specialty.topic
+
         # 1) Keyword Check
+        kw = specialty.match_keyword(query)
+        if kw:
+            logger.info(f"Found keyword '{kw}' => definitely about {topic}.")
+            return True
+
+        # 2) If no keywords found, fallback to probability-based classification
+        # (shared by every worker: the same question is classified only once)
+        try:
+            probability = self.classifications.get_or_compute(
+                f"{topic}|{normalize_question(query)}",
+                lambda: self._classify(query, topic, session_key),
+            )
+        except CircuitOpenError:
+            logger.info("Classifier circuit open, using keyword-only gating.")
+            return False
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Classifier failed ({e}), using keyword-only gating.")
+            return False
 
-        lower_query = query.lower()
-        for kw in self.coffee_keywords:
-            if kw in lower_query:
-                logger.info(f"Found keyword '{kw}' => definitely about infectologia.")
-                return True
+        threshold = 50
+        logger.info(f"{topic} probability: {probability}% (threshold={threshold})")
+        return probability >= threshold
 
-        # 2) If no keywords found, fallback to probability-based classification:
+    def _classify(self, query: str, topic: str, session_key=None) -> float:
         classification_prompt = f"""
             Eres un clasificador de textos sencillo.
-            Dada la consulta del usuario, estima la probabilidad (0-100) de que la consulta sea sobre infectologia o cualquier disciplina o tematica relacionada con la infectologia 
+            Dada la consulta del usuario, estima la probabilidad (0-100) de que la consulta sea sobre {topic} o cualquier disciplina o tematica relacionada con {topic}
             Devuelve SOLO un número del 0 al 100 (un entero). Sin texto adicional.
 
             User query: {query}
         """
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a short text classifier."},
-                {"role": "user", "content": classification_prompt}
-            ],
-            temperature=0
-        )
+        with openai_governor.slot(session_key):
+            response = self.breakers["classifier"].call(
+                self.client.chat.completions.create,
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a short text classifier."},
+                    {"role": "user", "content": classification_prompt}
+                ],
+                temperature=0
+            )
         result_text = response.choices[0].message.content.strip()
 
         try:
-            probability = float(result_text)
+            return float(result_text)
         except ValueError:
-            logger.info(f"Unexpected classification response: '{result_text}'. Defaulting to 50.")
-            probability = 50.0
-
-        threshold = 50
-        logger.info(f"Infectologia probability: {probability}% (threshold={threshold})")
-        return probability >= threshold
+            # Se propaga para no guardar en la caché compartida un valor inventado
+            raise ValueError(f"Unexpected classification response: '{result_text}'")
 
-    def groundx_search_content(self, query_spanish: str, query_english:str) -> str:
+    def groundx_search_content(self, query_spanish: str, query_english:str, session_key=None, specialty=None):
         """
-        Perform two GroundX searches: one in the Spanish bucket using the
-        Spanish query, and one in the English bucket using the English query.
-        Combine and return both sets of text.
+        Perform two GroundX searches in the specialty's bucket: one using the
+        Spanish query, and one using the English query.
+        Combine both sets of chunks into one context where every chunk carries a
+        short citation tag ([F1], [F2], ...). Searches still running when the
+        deadline passes are dropped, so the answer may use partial context.
+        When the specialty's topic router recognizes the question, both searches
+        are limited to the matching documents (falling back to the whole bucket).
+        While the GroundX circuit is open (or every search fails) the last good
+        context for the same question is reused, if there is one.
+
+        Returns:
+            tuple: (context text, provenance table tag -> document id, file name and pages)
         """
         t0 = time.time()
-
-        # 1) Search Spanish bucket
-        content_response_es = self.groundx.search.content(
-            id=self.bucket_id_spanish,
-            n=10,
-            query=query_spanish
-        )
-        results_es = content_response_es.search
-        text_es = results_es.text if results_es.text else ""
-
-        # # 2) Search English bucket
-        content_response_en = self.groundx.search.content(
-             id=self.bucket_id_spanish,
-             n=10,
-             query=query_english
-         )
-        results_en = content_response_en.search
-        text_en = results_en.text if results_en.text else ""
+        specialty = specialty or self.specialties.default
+
+        if self.breakers["groundx"].is_open():
+            cached = self.cached_context(query_spanish, specialty)
+            if cached:
+                logger.info("GroundX circuit open, reusing cached context.")
+                return cached
+            raise ValueError("GroundX unavailable and no cached context for this query.")
+
+        # 1) Narrow the search to the documents whose chapters match the question, if any
+        search_filter = specialty.topic_router.route(query_spanish, query_english)
+        chunks = self._search_both(query_spanish, query_english, session_key, specialty, search_filter)
+        if not chunks and search_filter:
+            # Metadata can be incomplete: a routed search with no results is retried on the whole bucket
+            metrics.increment("topic_router_fallbacks")
+            chunks = self._search_both(query_spanish, query_english, session_key, specialty)
 
         t1 = time.time()
         logger.info(f"groundx_search_content took {t1 - t0:.3f}s")
 
-        # Combine both texts (Spanish + English)
-        combined_text = f"{text_en}\n{text_es}".strip()
-        if not combined_text:
+        if not chunks:
+            cached = self.cached_context(query_spanish, specialty)
+            if cached:
+                logger.info("No context from GroundX, reusing cached context.")
+                return cached
             raise ValueError("No context found in either Spanish or English search.")
 
-        return combined_text
-
-    def translate_spanish_to_english(self, text: str) -> str:
+        context, provenance = self.build_context(chunks)
+        self._remember_context(query_spanish, context, provenance, specialty)
+        return context, provenance
+
+    def _search_both(self, query_spanish: str, query_english: str, session_key, specialty, search_filter=None) -> list:
+        # Search the Spanish and English queries in parallel, hedged and under a deadline
+        # (each search holds a GroundX governor slot, taken by the executor)
+        calls = {"es": lambda: self.search_chunks(query_spanish, specialty.bucket_id, search_filter)}
+        if query_english != query_spanish:  # sin traducción (traductor caído) basta una búsqueda
+            calls["en"] = lambda: self.search_chunks(query_english, specialty.bucket_id, search_filter)
+        results = self.search_executor.run(calls, session_key=session_key)
+        # English chunks first, then Spanish ones
+        return (results.get("en") or []) + (results.get("es") or [])
+
+    def search_chunks(self, query: str, bucket_id: int = None, search_filter: dict = None) -> list:
+        """
+        Run a single GroundX search (in the default bucket unless bucket_id is given),
+        optionally restricted by a metadata filter, and return its chunks as dicts
+        with chunk_id, document_id, file_name, pages and text. The caller holds the
+        GroundX governor slot (search_executor takes it for each search).
+        """
+        options = {"filter": search_filter} if search_filter else {}
+        content_response = self.breakers["groundx"].call(
+            self.groundx.search.content,
+            id=bucket_id or self.specialties.default.bucket_id,
+            n=10,
+            query=query,
+            request_options={"timeout_in_seconds": int(self.search_executor.deadline) + 1},
+            **options
+        )
+        results = content_response.search
+        chunks = [
+            {
+                "chunk_id": r.chunk_id,
+                "document_id": r.document_id,
+                "file_name": r.file_name or "",
+                "pages": [p.number for p in (r.pages or []) if p.number is not None],
+                "text": r.suggested_text or r.text or "",
+            }
+            for r in results.results or []
+        ]
+        if not chunks and results.text:
+            chunks = [{"chunk_id": None, "document_id": None, "file_name": "", "pages": [], "text": results.text}]
+        return [chunk for chunk in chunks if chunk["text"]]
+
+    @staticmethod
+    def build_context(chunks: list):
+        """
+        Context for the model with one citation tag per chunk, and the provenance table
+        that resolves those tags back to documents. Chunks returned by both searches
+        appear once.
+        """
+        sections, provenance, seen = [], {}, set()
+        for chunk in chunks:
+            if chunk["chunk_id"]:
+                if chunk["chunk_id"] in seen:
+                    continue
+                seen.add(chunk["chunk_id"])
+            if not chunk["file_name"]:
+                sections.append(chunk["text"])
+                continue
+            tag = f"F{len(provenance) + 1}"
+            provenance[tag] = {
+                "document_id": chunk["document_id"],
+                "file_name": chunk["file_name"],
+                "pages": chunk["pages"],
+            }
+            pages = f", pág. {', '.join(map(str, chunk['pages']))}" if chunk["pages"] else ""
+            sections.append(f"[{tag}] {chunk['file_name']}{pages}\n{chunk['text']}")
+        if provenance:
+            sections.insert(0, "Fuentes recuperadas. Cita cada dato con la etiqueta de su fuente entre corchetes, por ejemplo [F1].")
+        return "\n\n".join(sections), provenance
+
+    def translate_spanish_to_english(self, text: str, session_key=None) -> str:
+        try:
+            return self.translations.get_or_compute(text, lambda: self._translate(text, session_key))
+        except CircuitOpenError:
+            logger.info("Translator circuit open, searching with the original text only.")
+            return text
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Translation failed ({e}), searching with the original text only.")
+            return text
+
+    def _translate(self, text: str, session_key=None) -> str:
         translation_prompt = f"""
             Translate the following text from Spanish to English. 
             Output only the translated text, nothing else.
@@ -165,30 +296,34 @@ class RAGService:
             Text to translate:
             {text}
         """
-
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a translator. You translate Spanish text into English."},
-                {"role": "user", "content": translation_prompt}
-            ],
-            temperature=0,
-            max_tokens=1000
-        )
+        with openai_governor.slot(session_key):
+            response = self.breakers["translator"].call(
+                self.client.chat.completions.create,
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a translator. You translate Spanish text into English."},
+                    {"role": "user", "content": translation_prompt}
+                ],
+                temperature=0,
+                max_tokens=1000
+            )
         english_translation = response.choices[0].message.content.strip()
         return english_translation
 
-    def process_references_in_text(self, text: str) -> str:
+    def process_references_in_text(self, text: str, specialty=None, provenance: dict = None) -> str:
         """
-        Utiliza ReferenceMaker para procesar referencias en el texto.
+        Utiliza el ReferenceMaker de la especialidad para procesar referencias en el texto.
 
         Args:
             text (str): El texto a procesar.
+            specialty (Specialty, opcional): Especialidad; por defecto la principal.
+            provenance (dict, opcional): Tabla de procedencia del contexto de la respuesta.
 
         Returns:
             str: El texto con referencias reemplazadas por enlaces.
         """
         logger.info("Procesando referencias en el texto mediante ReferenceMaker.")
-        processed_text = self.reference_maker.process_text_references_with_citations(text)
+        reference_maker = (specialty or self.specialties.default).reference_maker
+        processed_text = reference_maker.process_text_references_with_citations(text, provenance)
         logger.info("Referencias procesadas.")
         return processed_text
\ No newline at end of file
@@ -0,0 +1,179 @@
+# classes/answer_bank.py
+import os
+import re
+import json
+import logging
+import threading
+from collections import Counter
+from rapidfuzz import process, fuzz
+
+from classes.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "answer_bank.json")
+
+# Marcas de cita y bloque final de referencias, tal como quedan guardados en Feedback
+CITATION_MARK = re.compile(r'\s*<span class="doc-citation-number">\[\d+\]</span>|(?<=\*\*)\[\d+\]')
+REFERENCES_BLOCK = re.compile(r"\n\s*(?:<b>)?(?:Referencias|References):(?:</b>)?\s*\n.*\Z", re.DOTALL)
+
+
+def clean_answer(answer: str) -> str:
+    """
+    Quita las citas numeradas y el bloque de referencias: apuntan a los documentos y
+    enlaces de la respuesta original, que al reproducirla desde el banco ya no aplican.
+    """
+    answer = REFERENCES_BLOCK.sub("", answer)
+    return CITATION_MARK.sub("", answer).strip()
+
+
+class AnswerBankBuilder:
+    """
+    Construye (o actualiza) el banco de respuestas a partir de las filas de Feedback.
+
+    Las preguntas con evaluación "up" se agrupan con rapidfuzz; cada grupo guarda todas
+    sus variantes normalizadas y una respuesta canónica (la más votada). Sólo se procesan
+    las filas con id mayor al último incorporado, de modo que el banco crece de forma
+    incremental a medida que llega feedback nuevo.
+
+    Cada especialidad tiene su propio banco: con `specialty` sólo se usan las filas cuyo
+    marker coincide, más las filas sin marker si `include_unmarked` (el feedback anterior
+    a la columna marker es de la especialidad por defecto).
+    """
+
+    def __init__(self, bank_path: str = DEFAULT_BANK_PATH, threshold: int = 90, min_words: int = 3,
+                 specialty: str = None, include_unmarked: bool = True):
+        self.bank_path = bank_path
+        self.threshold = threshold
+        self.min_words = min_words
+        self.specialty = specialty
+        self.include_unmarked = include_unmarked
+
+    def matches_specialty(self, row) -> bool:
+        if self.specialty is None:
+            return True
+        marker = row.get("marker")
+        if not marker:
+            return self.include_unmarked
+        return normalize_question(marker) == normalize_question(self.specialty)
+
+    def load(self) -> dict:
+        try:
+            with open(self.bank_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"last_feedback_id": 0, "clusters": []}
+
+    def update(self, rows) -> dict:
+        """
+        Incorpora filas de feedback (dicts con id, pregunta, respuesta, evaluacion y marker) al banco.
+        """
+        bank = self.load()
+        last_id = bank.get("last_feedback_id", 0)
+        clusters = bank["clusters"]
+        new_rows = sorted((r for r in rows if r["id"] > last_id), key=lambda r: r["id"])
+
+        for row in new_rows:
+            last_id = max(last_id, row["id"])
+            if not self.matches_specialty(row):
+                continue
+            question = normalize_question(row["pregunta"])
+            if len(question.split()) < self.min_words:
+                continue  # saludos y mensajes muy cortos no se guardan
+
+            cluster = self._find_cluster(clusters, question)
+            if cluster is None:
+                if row["evaluacion"] != "up":
+                    continue
+                cluster = {"questions": [], "votes": {}}
+                clusters.append(cluster)
+
+            if question not in cluster["questions"]:
+                cluster["questions"].append(question)
+            answer = clean_answer(row["respuesta"])
+            if not answer:
+                continue
+            cluster["votes"][answer] = cluster["votes"].get(answer, 0) + (1 if row["evaluacion"] == "up" else -1)
+
+        for cluster in clusters:
+            votes = Counter(cluster["votes"])
+            best = votes.most_common(1)
+            cluster["answer"] = best[0][0] if best and best[0][1] > 0 else None
+
+        bank = {"last_feedback_id": last_id, "clusters": clusters}
+        tmp_path = self.bank_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(bank, f, ensure_ascii=False)
+        os.replace(tmp_path, self.bank_path)
+        logger.info(f"Answer bank: {len(new_rows)} new feedback rows, {len(clusters)} clusters")
+        return bank
+
+    def _find_cluster(self, clusters, question: str):
+        choices = {}
+        for i, cluster in enumerate(clusters):
+            for q in cluster["questions"]:
+                choices[(i, q)] = q
+        if not choices:
+            return None
+        match = process.extractOne(question, choices, scorer=fuzz.token_sort_ratio, score_cutoff=self.threshold)
+        if match is None:
+            return None
+        return clusters[match[2][0]]
+
+
+class AnswerBank:
+    """
+    Búsqueda en tiempo de ejecución sobre el banco de respuestas curadas.
+    El archivo se vuelve a cargar cuando cambia su mtime.
+    """
+
+    def __init__(self, bank_path: str = None, threshold: int = None):
+        self.bank_path = bank_path or os.getenv("ANSWER_BANK_PATH", DEFAULT_BANK_PATH)
+        self.threshold = threshold or int(os.getenv("ANSWER_BANK_THRESHOLD", 95))
+        self.version = None
+        self.questions = []
+        self.answers = []
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.bank_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.version:
+            return
+        with self._lock:
+            if mtime == self.version:
+                return
+            try:
+                with open(self.bank_path, "r", encoding="utf-8") as f:
+                    bank = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading answer bank {self.bank_path}: {e}")
+                self.version = mtime
+                return
+            questions, answers = [], []
+            for cluster in bank.get("clusters", []):
+                if not cluster.get("answer"):
+                    continue
+                for q in cluster["questions"]:
+                    questions.append(q)
+                    answers.append(cluster["answer"])
+            self.questions, self.answers = questions, answers
+            self.version = mtime
+            logger.info(f"Answer bank loaded: {len(questions)} questions")
+
+    def lookup(self, query: str):
+        """
+        Devuelve la respuesta curada si la pregunta coincide con alta confianza, o None.
+        """
+        self._reload_if_changed()
+        if not self.questions:
+            return None
+        match = process.extractOne(
+            normalize_question(query), self.questions, scorer=fuzz.token_sort_ratio, score_cutoff=self.threshold
+        )
+        if match is None:
+            return None
+        logger.info(f"Answer bank match ({match[1]:.0f}%): '{match[0]}'")
+        return self.answers[match[2]]
@@ -0,0 +1,98 @@
+# classes/answer_cache.py
+import os
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normaliza una pregunta para usarla como clave: minúsculas, sin tildes,
+    sin signos de puntuación y con espacios simples.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text.lower())
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """
+    Caché de respuestas completas con TTL y tamaño máximo.
+
+    La clave combina la pregunta normalizada, un hash del contexto recuperado y un hash del
+    historial de la conversación, prefijada por un espacio de nombres (la especialidad).
+    Las entradas de un espacio de nombres se invalidan cuando cambia su "generación"
+    (versión de las instrucciones o de los documentos).
+    """
+
+    def __init__(self, ttl_seconds: int = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+        self._entries = OrderedDict()
+        self._generations = {}  # espacio de nombres -> generación vigente
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, system_context: str, context_history, namespace: str = "") -> str:
+        h = hashlib.sha256()
+        h.update(normalize_question(query).encode("utf-8"))
+        h.update(b"\0")
+        h.update(hashlib.sha256(system_context.encode("utf-8")).digest())
+        for q, a in context_history:
+            h.update(b"\0")
+            h.update(q.encode("utf-8"))
+            h.update(b"\1")
+            h.update(a.encode("utf-8"))
+        return f"{namespace}:{h.hexdigest()}"
+
+    def check_generation(self, generation, namespace: str = ""):
+        """
+        Descarta las entradas del espacio de nombres si cambiaron sus instrucciones o documentos.
+        """
+        with self._lock:
+            if generation != self._generations.get(namespace):
+                prefix = f"{namespace}:"
+                stale = [key for key in self._entries if key.startswith(prefix)]
+                for key in stale:
+                    del self._entries[key]
+                if stale:
+                    logger.info(f"Answer cache invalidated for '{namespace}' ({len(stale)} entries)")
+                self._generations[namespace] = generation
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            answer, expires = entry
+            if expires < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def set(self, key: str, answer: str):
+        with self._lock:
+            self._entries[key] = (answer, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def replay(answer: str, chunk_size: int = 64):
+        """
+        Reproduce una respuesta guardada por partes, igual que un stream nuevo.
+        """
+        for i in range(0, len(answer), chunk_size):
+            yield answer[i:i + chunk_size]
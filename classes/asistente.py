@@ -4,12 +4,16 @@ import time
 import sys
 import io
 import logging
-from openai import OpenAI
-from groundx import GroundX
 from dotenv import load_dotenv
 
 from classes.RAG import RAGService
-from classes.instruction_parser import InstructionParser
+from classes.answer_cache import AnswerCache
+from classes.answer_bank import AnswerBank
+from classes.model_router import ModelRouter
+from classes.history_compactor import HistoryCompactor
+from classes.metrics import metrics
+from classes.clients import openai_client, groundx_client
+from classes.governor import openai_governor, OverloadedError
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -25,13 +29,16 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class Asistente:
-    def __init__(self, db):
+    def __init__(self, db, specialty=None, answer_cache=None, model_router=None):
         """
         Initialize the Asistente class with configurations for OpenAI and GroundX APIs.
+        One Asistente serves one specialty (the default one unless given); the answer
+        cache and model router can be shared between the specialties of a process.
         """
 
         # Initialize RAG service
         self.rag_service = RAGService()
+        self.specialty = specialty or self.rag_service.specialties.default
 
         # Cargar API keys y bucket ID desde variables de entorno
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -62,23 +69,85 @@ class Asistente:
         #self.bucket_id_english = int(self.bucket_id_english)
 
         # Set other configurations
-        self.completion_model = "o1-preview-2024-09-12"
-        instruction_parser = InstructionParser("instructions.json")
-        self.instruction = instruction_parser.load_instruction()
+        self.model_router = model_router or ModelRouter()
+        self.instruction_parser = self.specialty.instruction_parser
 
-        # Initialize GroundX and OpenAI clients
-        self.groundx = GroundX(api_key=self.groundx_api_key)
-        self.client = OpenAI(api_key=self.openai_api_key)
-
-        # Initialize conversation context
+        # Initialize conversation context: the last turns verbatim, older ones folded into a summary
         self.context_history = []
+        self.history_compactor = HistoryCompactor(lambda: self.client)
+
+        # Cache of complete answers for repeated questions
+        self.answer_cache = answer_cache or AnswerCache()
 
-        # Load coffee keywords from external file
-        self.coffee_keywords = self.rag_service.load_coffee_keywords("kw.txt")
+        # Curated answers built offline from up-voted feedback (build_answer_bank.py)
+        self.answer_bank = AnswerBank(bank_path=self.specialty.answer_bank_path)
 
         # Guardar referencia a la base de datos
         self.db = db
 
+    @property
+    def client(self):
+        """
+        OpenAI client shared with RAGService, created on first use (after the gunicorn fork).
+        """
+        return openai_client(self.openai_api_key)
+
+    @property
+    def groundx(self):
+        return groundx_client(self.groundx_api_key)
+
+    @property
+    def instruction(self) -> str:
+        """
+        Current instruction text; instructions.json is reloaded when its mtime changes.
+        """
+        return self.instruction_parser.get_instruction()
+
+    def build_messages(self, query: str, system_context: str) -> list:
+        """
+        Build the messages array with a byte-stable prefix first (instructions, then the
+        conversation history) and the volatile retrieved context next to the current query,
+        so upstream prompt caching can reuse the prefix across requests.
+        """
+        messages = [{"role": "user", "content": self.instruction}]
+        for q, a in self.conversation_turns():
+            messages.append({"role": "user", "content": q})
+            messages.append({"role": "assistant", "content": a})
+
+        messages.append({"role": "user", "content": f"===\n{system_context}\n===\n\n{query}"})
+        return messages
+
+    def cache_generation(self):
+        """
+        Version of the inputs a cached answer depends on: the specialty's instructions file
+        and documents directory. When either changes, its cached answers are discarded.
+        """
+        return self.specialty.generation()
+
+    def conversation_turns(self) -> list:
+        """
+        History sent with each request: the running summary of older turns (plus any
+        turns still waiting to be folded) followed by the recent turns verbatim.
+        """
+        return self.history_compactor.older_turns() + self.context_history
+
+    def remember(self, query: str, answer: str):
+        """
+        Store a (query, answer) pair in the conversation context. Turns beyond the
+        verbatim window are folded into the summary in the background.
+        """
+        self.context_history.append((query, answer))
+        self.context_history = self.history_compactor.compact(self.context_history)
+
+    def erase_last(self):
+        """
+        Remove the last (query, answer) pair and the folded summary of older turns, so no
+        summary of the erased conversation reaches the next prompt.
+        """
+        popped = self.context_history.pop() if self.context_history else None
+        self.history_compactor.reset()
+        return popped
+
     def error_handler(self, error_message: str, query: str):
         """
         Handle errors by logging them and notifying the user.
@@ -125,22 +194,63 @@ class Asistente:
     #
     #     return assistant_response
 
-    def chat_completions_stream(self, query: str):
+    def degraded_label(self, circuits) -> str:
+        """
+        Aviso que precede a las respuestas generadas con algún upstream caído.
+        """
+        names = {
+            "groundx": "búsqueda en documentos",
+            "classifier": "clasificador de consultas",
+            "translator": "traductor",
+        }
+        unavailable = ", ".join(names.get(c, c) for c in circuits)
+        return f"_Respuesta en modo degradado (no disponible: {unavailable})._\n\n"
+
+    def chat_completions_stream(self, query: str, stream_info: dict = None, session_key=None):
         """
         Similar to chat_completions, but uses stream=True to yield partial chunks.
+        If stream_info is given, stream_info["cache"] is set to "bank", "hit" or "miss" and
+        stream_info["provenance"] to the citation tags of the retrieved context.
+        session_key identifies the user for fair queueing of upstream calls; if the upstream
+        queues are full, OverloadedError is raised instead of yielding an apology.
+        When a retrieval upstream's circuit is open the answer is prefixed with a
+        degraded-mode notice and is not stored in the answer cache.
         """
         try:
+            # 0a) High-confidence match in the curated answer bank: answer before any retrieval
+            banked_answer = self.answer_bank.lookup(query)
+            if banked_answer is not None:
+                if stream_info is not None:
+                    stream_info["cache"] = "bank"
+                yield from self.answer_cache.replay(banked_answer)
+                self.remember(query, banked_answer)
+                return
+
             # 0) Decide if we should do RAG at all
-            if self.rag_service.should_call_groundx(query):
+            provenance = {}
+            is_rag = self.rag_service.should_call_groundx(query, session_key=session_key, specialty=self.specialty)
+            if is_rag:
                 start_time = time.time()
                 logger.info(f"chat_completions_stream called with query='{query}'")
 
                 # # 1) Translate the Spanish query into English
-                query_english = self.rag_service.translate_spanish_to_english(query)
+                query_english = self.rag_service.translate_spanish_to_english(query, session_key=session_key)
                 logger.info(f"Translated to English => '{query_english}'")
 
                 # 2) Retrieve RAG context from both Spanish & English buckets
-                system_context = self.rag_service.groundx_search_content(query_spanish=query, query_english=query_english)
+                try:
+                    system_context, provenance = self.rag_service.groundx_search_content(
+                        query_spanish=query, query_english=query_english, session_key=session_key,
+                        specialty=self.specialty
+                    )
+                except ValueError:
+                    if "groundx" not in self.rag_service.open_circuits():
+                        raise
+                    # GroundX is down and there is no cached context: answer from general knowledge
+                    system_context = (
+                        "No documents retrieved for this question. "
+                        "Respond using only your general knowledge."
+                    )
 
                 after_groundx = time.time()
                 logger.info("Received system_context...")
@@ -158,13 +268,30 @@ class Asistente:
                 )
 
             after_groundx = time.time()
-            # 3) Build the messages array (system + conversation history + user query)
-            messages = [{"role": "user", "content": f"{self.instruction}\n===\n{system_context}\n==="}]
-            for q, a in self.context_history:
-                messages.append({"role": "user", "content": q})
-                messages.append({"role": "assistant", "content": a})
-
-            messages.append({"role": "user", "content": query})
+            if stream_info is not None:
+                # Source tags of this context, used to resolve the answer's citations exactly
+                stream_info["provenance"] = provenance
+
+            # 2a) Degraded mode: an upstream is down; these answers are not cached
+            degraded = self.rag_service.open_circuits()
+
+            # 2b) Replay a cached answer for the same question, context and recent turns
+            # (the verbatim window; a first-turn question is keyed on question and context only)
+            self.answer_cache.check_generation(self.cache_generation(), namespace=self.specialty.name)
+            cache_key = self.answer_cache.make_key(
+                query, system_context, self.context_history, namespace=self.specialty.name
+            )
+            cached_answer = None if degraded else self.answer_cache.get(cache_key)
+            if stream_info is not None:
+                stream_info["cache"] = "hit" if cached_answer is not None else "miss"
+            if cached_answer is not None:
+                logger.info(f"Answer cache hit for query='{query}'")
+                yield from self.answer_cache.replay(cached_answer)
+                self.remember(query, cached_answer)
+                return
+
+            # 3) Build the messages array (static prefix + conversation history + context and query)
+            messages = self.build_messages(query, system_context)
 
             logger.info("\n=== Messages Sent to OpenAI API (Streaming) START ===")
             for msg in messages:
@@ -173,41 +300,78 @@ class Asistente:
                 # logger.debug(f"Role: {role}, Content: {content}\n")
             logger.info("=== Messages Sent to OpenAI API (Streaming) END ===\n")
 
+            # 3b) Pick the model tier for this request
+            route = self.model_router.route(query, is_rag, self.context_history)
+
             pre_openai_time = time.time()
             logger.info(f"About to call OpenAI, {pre_openai_time - after_groundx:.3f}s since start")
 
-            # 4) Call the OpenAI API with stream=True
-            response = self.client.chat.completions.create(
-                model=self.completion_model,
-                messages=messages,
-                stream=True,
-                store=True
-            )
-            logger.info("Called OpenAI with stream=True")
-            after_openai_call_time = time.time()
-            logger.info(f"Called OpenAI, waiting for chunks, {after_openai_call_time - pre_openai_time:.3f}s since pre_call")
-
-            # 5) The OpenAI API returns chunks as an iterator; yield partial text
-            partial_answer = []
+            # 4) Call the OpenAI API with stream=True, holding an upstream slot until the stream ends.
+            # The slot is taken before anything is yielded, so OverloadedError can still become a 503
+            openai_governor.acquire(session_key)
             try:
-                for chunk in response:
-                    choice_delta = chunk.choices[0].delta
-                    chunk_text = choice_delta.content
-                    if chunk_text:
-                        partial_answer.append(chunk_text)
-                        yield chunk_text
-            except Exception as e:
-                logger.error(f"Streaming error: {e}")
+                if degraded:
+                    # Tell the user which upstream is down
+                    metrics.increment("degraded_answers")
+                    yield self.degraded_label(degraded)
+                response = self.client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    store=True
+                )
+                logger.info("Called OpenAI with stream=True")
+                after_openai_call_time = time.time()
+                logger.info(f"Called OpenAI, waiting for chunks, {after_openai_call_time - pre_openai_time:.3f}s since pre_call")
+
+                # 5) The OpenAI API returns chunks as an iterator; yield partial text
+                partial_answer = []
+                stream_completed = False
+                first_token_time = None
+                try:
+                    for chunk in response:
+                        if not chunk.choices:
+                            # Final usage chunk: report how much of the prompt prefix was cached upstream
+                            if chunk.usage:
+                                details = getattr(chunk.usage, "prompt_tokens_details", None)
+                                cached = getattr(details, "cached_tokens", 0) if details else 0
+                                logger.info(f"Prompt tokens={chunk.usage.prompt_tokens}, cached={cached}")
+                            continue
+                        choice_delta = chunk.choices[0].delta
+                        chunk_text = choice_delta.content
+                        if chunk_text:
+                            if first_token_time is None:
+                                first_token_time = time.time()
+                            partial_answer.append(chunk_text)
+                            yield chunk_text
+                    stream_completed = True
+                except GeneratorExit:
+                    # The client went away: stop the upstream stream now and skip post-processing
+                    response.close()
+                    metrics.increment("abandoned_streams")
+                    logger.info(f"Client aborted the stream after {len(partial_answer)} chunks; upstream closed")
+                    raise
+                except Exception as e:
+                    logger.error(f"Streaming error: {e}")
+            finally:
+                openai_governor.release()
+
+            end_time = time.time()
+            self.model_router.record(
+                route.tier, (first_token_time or end_time) - pre_openai_time, end_time - pre_openai_time
+            )
 
             # 6) Once done, store the final combined answer in context
             final_answer = "".join(partial_answer).strip()
-            self.context_history.append((query, final_answer))
+            self.remember(query, final_answer)
             logger.info(f"Final answer length={len(final_answer)}")
 
-            # Optionally limit history length
-            if len(self.context_history) > 10:
-                self.context_history.pop(0)
+            if stream_completed and final_answer and not degraded:
+                self.answer_cache.set(cache_key, final_answer)
 
+        except OverloadedError:
+            raise
         except Exception as e:
             error_response = self.error_handler(str(e), query)
             yield error_response
\ No newline at end of file
@@ -1,29 +1,24 @@
-import json
 # File: classes/asistente_osma.py
 
-import os
 import logging
+import datetime
+
+from classes.osma_catalog import OsmaCatalog
+from classes.osma_series import INTERVAL_CODES
 
 logger = logging.getLogger(__name__)
 
 
 class AsistenteOSMA:
     def __init__(self):
-        json_path = os.path.join(os.path.dirname(__file__), '..', 'osma_data.json')
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            logger.info(f"Archivo de OSMA cargado desde: {json_path}")
-        except Exception as e:
-            logger.error(f"Error al cargar el archivo JSON de OSMA: {e}")
-            self.data = {}
-
         self.state = 0
         self.servicio = None          # Ahora será una lista de servicios seleccionados
         self.monitoreable = None      # Lista de monitoreables seleccionados
         self.variables = None         # Lista de variables seleccionadas
         self.rango_fechas = None
         self.intervalo = None
+        self.candidatos = None        # Variables resueltas desde texto libre
+        self.seleccion = None         # Ternas [servicio, monitoreable, variable] resueltas desde texto libre
 
         self.preguntas = [
             "¿Qué servicio(s) desea seleccionar?",
@@ -33,6 +28,38 @@ class AsistenteOSMA:
             "¿Qué intervalo de consulta requiere? (Minuto, Hora, Día o Mes)"
         ]
 
+    @property
+    def catalog(self):
+        # El catálogo se carga una sola vez por proceso y se comparte entre sesiones
+        # (mientras no se pudo cargar, cada acceso puede reintentar)
+        return OsmaCatalog.get()
+
+    def to_dict(self):
+        """
+        Estado serializable del diálogo, para guardarlo entre peticiones.
+        """
+        return {
+            "state": self.state,
+            "servicio": self.servicio,
+            "monitoreable": self.monitoreable,
+            "variables": self.variables,
+            "rango_fechas": self.rango_fechas,
+            "intervalo": self.intervalo,
+            "seleccion": self.seleccion,
+        }
+
+    @classmethod
+    def from_dict(cls, estado):
+        asistente = cls()
+        asistente.state = estado.get("state", 0)
+        asistente.servicio = estado.get("servicio")
+        asistente.monitoreable = estado.get("monitoreable")
+        asistente.variables = estado.get("variables")
+        asistente.rango_fechas = estado.get("rango_fechas")
+        asistente.intervalo = estado.get("intervalo")
+        asistente.seleccion = estado.get("seleccion")
+        return asistente
+
     def iniciar_dialogo(self):
         self.state = 0
         self.servicio = None
@@ -40,24 +67,23 @@ class AsistenteOSMA:
         self.variables = None
         self.rango_fechas = None
         self.intervalo = None
+        self.candidatos = None
+        self.seleccion = None
         logger.info("Iniciando diálogo de importación de datos OSMA")
         return self.preguntas[self.state]
 
     def procesar_respuesta(self, respuesta):
         if self.state == 0:
             selected = [s.strip() for s in respuesta.split(',')]
-            valid = [s for s in selected if s in self.data.keys()]
+            valid = [s for s in selected if self.catalog.has_service(s)]
             if not valid:
+                if self.resolver_texto_libre(respuesta):
+                    return self.preguntas[self.state]
                 return "Ningún servicio válido seleccionado. Por favor, intente de nuevo."
             self.servicio = valid
         elif self.state == 1:
             selected = [s.strip() for s in respuesta.split(',')]
-            valid = []
-            for mon in selected:
-                for serv in self.servicio:
-                    if mon in self.data.get(serv, {}).keys():
-                        valid.append(mon)
-                        break
+            valid = [mon for mon in selected if self.catalog.has_monitoreable(self.servicio, mon)]
             if not valid:
                 return "Monitoreable no encontrado para los servicios seleccionados. Intente nuevamente."
             self.monitoreable = valid
@@ -75,6 +101,68 @@ class AsistenteOSMA:
         else:
             return self.finalizar_dialogo()
 
+    def resolver_texto_libre(self, texto, min_score=85):
+        """
+        Intenta resolver una frase libre directamente a variables del catálogo.
+        Si hay coincidencias suficientemente buenas, completa servicio, monitoreable y
+        variables y salta a la pregunta de fechas.
+        """
+        candidatos = self.catalog.search_index.search(texto)
+        if not candidatos or candidatos[0]["score"] < min_score:
+            return False
+
+        best = candidatos[0]["score"]
+        elegidos = [c for c in candidatos if c["score"] == best]
+        self.candidatos = candidatos
+        self.servicio = list(dict.fromkeys(c["servicio"] for c in elegidos))
+        self.monitoreable = list(dict.fromkeys(c["monitoreable"] for c in elegidos))
+        self.variables = list(dict.fromkeys(c["variable"] for c in elegidos))
+        self.seleccion = [[c["servicio"], c["monitoreable"], c["variable"]] for c in elegidos]
+        self.state = 3
+        logger.info(f"Texto libre '{texto}' resuelto a {[c['idVariable'] for c in elegidos]}")
+        return True
+
+    def variables_seleccionadas(self):
+        """
+        Devuelve las variables elegidas con su idVariable. Las resueltas desde texto libre
+        se usan tal cual; las elegidas paso a paso, para cada servicio/monitoreable
+        seleccionado en el que existan.
+        """
+        if self.seleccion:
+            ternas = [tuple(terna) for terna in self.seleccion]
+        else:
+            ternas = [
+                (serv, mon, var)
+                for serv in self.servicio or []
+                for mon in self.monitoreable or []
+                for var in self.variables or []
+            ]
+        seleccion = []
+        for serv, mon, var in ternas:
+            id_variable = self.catalog.id_by_key.get((serv, mon, var))
+            if id_variable is not None:
+                seleccion.append({
+                    "idVariable": id_variable,
+                    "servicio": serv,
+                    "monitoreable": mon,
+                    "variable": var,
+                })
+        return seleccion
+
+    def fechas(self):
+        """
+        Interpreta rango_fechas ("inicio, fin") y devuelve (fechaInicio, fechaFin) como datetime.
+        """
+        inicio, fin = [f.strip().replace("T", " ") for f in self.rango_fechas.split(",")]
+        return (datetime.datetime.strptime(inicio, "%Y-%m-%d %H:%M"),
+                datetime.datetime.strptime(fin, "%Y-%m-%d %H:%M"))
+
+    def intervalo_api(self):
+        """
+        Código de intervalo de la API de OSMA (MIN, HOUR, DAY, MONTH).
+        """
+        return INTERVAL_CODES.get(self.intervalo, self.intervalo)
+
     def finalizar_dialogo(self):
         resumen = (
             f"Configuración OSMA:\n"
@@ -0,0 +1,94 @@
+# classes/circuit_breaker.py
+import os
+import time
+import logging
+import threading
+
+from classes.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Se lanza cuando se intenta llamar a un upstream cuyo circuito está abierto.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuito '{name}' abierto: upstream no disponible")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por upstream (GroundX, clasificador, traductor).
+
+    Tras `failure_threshold` fallos consecutivos el circuito se abre y las llamadas fallan
+    de inmediato durante `reset_timeout` segundos. Luego pasa a semiabierto y deja pasar
+    una sola llamada de prueba: si funciona se cierra, si falla se vuelve a abrir.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+        self.reset_timeout = reset_timeout or float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """
+        True si las llamadas se rechazarían ahora (sin consumir la llamada de prueba).
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info(f"Circuit '{self.name}' half-open: sending probe")
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.increment(f"{self.name}_circuit_opened")
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            metrics.increment(f"{self.name}_circuit_rejected")
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,34 @@
+# classes/clients.py
+import os
+import threading
+
+from groundx import GroundX
+from openai import OpenAI
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _shared(kind: str, api_key: str, factory):
+    """
+    Devuelve el cliente compartido para (tipo, api key), creándolo en el primer uso.
+
+    Los clientes se crean de forma perezosa para que no existan en el proceso maestro de
+    gunicorn (con --preload): así cada worker abre sus propias conexiones después del fork.
+    """
+    key = (kind, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def openai_client(api_key: str) -> OpenAI:
+    return _shared("openai", api_key, lambda: OpenAI(api_key=api_key))
+
+
+def groundx_client(api_key: str) -> GroundX:
+    return _shared("groundx", api_key, lambda: GroundX(api_key=api_key, base_url=os.getenv("GROUNDX_BASE_URL")))
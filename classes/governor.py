@@ -0,0 +1,149 @@
+# classes/governor.py
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from classes.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """
+    Se lanza cuando la cola de espera de un upstream está llena o la espera se agota.
+    """
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Upstream '{name}' saturado, reintente en {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyGovernor:
+    """
+    Limita las llamadas en curso a un upstream (OpenAI, GroundX).
+
+    Las peticiones que no tienen lugar esperan en una cola acotada; los lugares que se
+    liberan se reparten por turnos entre sesiones, para que un usuario con muchas
+    peticiones no acapare el upstream. Si la cola está llena se rechaza enseguida con
+    OverloadedError (que se traduce en un 503 con Retry-After).
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, max_wait: float, retry_after: int = 5):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._queues = OrderedDict()  # sesión -> deque de tickets en espera
+        self._granted = set()
+
+    @classmethod
+    def from_env(cls, name: str, max_in_flight: int, max_queue: int):
+        prefix = name.upper()
+        return cls(
+            name,
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", max_in_flight)),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", max_queue)),
+            max_wait=float(os.getenv(f"{prefix}_MAX_WAIT", 30)),
+            retry_after=int(os.getenv("UPSTREAM_RETRY_AFTER", 5)),
+        )
+
+    @property
+    def waiting(self) -> int:
+        """
+        Peticiones esperando lugar en la cola.
+        """
+        return self._waiting
+
+    @contextmanager
+    def slot(self, session_key=None):
+        self.acquire(session_key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, session_key=None):
+        start = time.monotonic()
+        with self._cond:
+            if self._in_flight < self.max_in_flight and self._waiting == 0:
+                self._in_flight += 1
+                metrics.observe(f"{self.name}_queue_wait", 0.0)
+                return
+
+            if self._waiting >= self.max_queue:
+                metrics.increment(f"{self.name}_rejected")
+                logger.warning(f"{self.name}: queue full ({self._waiting} waiting), rejecting request")
+                raise OverloadedError(self.name, self.retry_after)
+
+            ticket = object()
+            self._queues.setdefault(session_key, deque()).append(ticket)
+            self._waiting += 1
+            deadline = start + self.max_wait
+
+            while ticket not in self._granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._cancel(session_key, ticket)
+                    metrics.increment(f"{self.name}_timeouts")
+                    logger.warning(f"{self.name}: gave up after waiting {self.max_wait:.0f}s in queue")
+                    raise OverloadedError(self.name, self.retry_after)
+                self._cond.wait(remaining)
+
+            self._granted.discard(ticket)
+
+        metrics.observe(f"{self.name}_queue_wait", time.monotonic() - start)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._grant()
+
+    def _grant(self):
+        # Turnos entre sesiones: se atiende la primera sesión y pasa al final de la fila
+        while self._in_flight < self.max_in_flight and self._queues:
+            session_key, tickets = next(iter(self._queues.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                self._queues.move_to_end(session_key)
+            else:
+                del self._queues[session_key]
+            self._granted.add(ticket)
+            self._in_flight += 1
+            self._waiting -= 1
+        self._cond.notify_all()
+
+    def _cancel(self, session_key, ticket):
+        tickets = self._queues.get(session_key)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[session_key]
+            self._waiting -= 1
+
+
+def worker_threads() -> int:
+    """
+    Peticiones simultáneas de un worker (gunicorn.conf.py exporta GUNICORN_THREADS).
+    """
+    return int(os.getenv("GUNICORN_THREADS", 16))
+
+
+# Límites por worker, a partir de sus hilos: lugares + cola quedan por debajo de las
+# llamadas simultáneas posibles (una a OpenAI y dos búsquedas por petición), así una
+# ráfaga llega a esperar y, si la cola se llena, a rechazarse con 503 en lugar de
+# quedar retenida en los hilos de gunicorn.
+_threads = worker_threads()
+openai_governor = ConcurrencyGovernor.from_env(
+    "openai", max_in_flight=max(1, _threads // 2), max_queue=max(1, _threads // 4)
+)
+groundx_governor = ConcurrencyGovernor.from_env(
+    "groundx", max_in_flight=_threads, max_queue=max(1, _threads // 2)
+)
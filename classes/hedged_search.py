@@ -0,0 +1,133 @@
+# classes/hedged_search.py
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from classes.metrics import metrics
+from classes.governor import OverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedExecutor:
+    """
+    Ejecuta varias búsquedas en paralelo bajo un plazo (deadline) por petición.
+
+    Si una búsqueda no respondió cuando se alcanza el percentil configurado de las
+    latencias recientes, se lanza una segunda copia (hedge) y se usa la primera respuesta.
+    Al vencer el plazo se devuelve lo que haya llegado; las búsquedas pendientes quedan
+    como None para que la respuesta continúe con contexto parcial.
+
+    Con un `governor`, cada búsqueda toma su lugar en el upstream antes de empezar: la
+    espera en la cola no cuenta como latencia, no se lanzan hedges mientras haya peticiones
+    esperando y un OverloadedError se propaga a quien llamó a run().
+    """
+
+    def __init__(self, name: str = "groundx", governor=None):
+        self.name = name
+        self.governor = governor
+        self.deadline = float(os.getenv("GROUNDX_DEADLINE", 8))
+        self.hedge_percentile = float(os.getenv("GROUNDX_HEDGE_PERCENTILE", 0.9))
+        self.hedge_floor = float(os.getenv("GROUNDX_HEDGE_MIN_DELAY", 0.5))
+        self.hedge_default = float(os.getenv("GROUNDX_HEDGE_DEFAULT_DELAY", 2.0))
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("GROUNDX_SEARCH_WORKERS", 16)), thread_name_prefix=f"{name}-search"
+        )
+
+    def hedge_delay(self) -> float:
+        """
+        Umbral adaptativo: percentil de las latencias recientes (con un mínimo).
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return self.hedge_default
+        return max(self.hedge_floor, samples[int(self.hedge_percentile * (len(samples) - 1))])
+
+    def _timed(self, name, fn, started, session_key):
+        if self.governor is not None:
+            self.governor.acquire(session_key)
+        try:
+            start = time.monotonic()
+            started.setdefault(name, start)  # el plazo del hedge corre desde que empieza la búsqueda
+            result = fn()
+        finally:
+            if self.governor is not None:
+                self.governor.release()
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _queue_busy(self) -> bool:
+        return self.governor is not None and self.governor.waiting > 0
+
+    def run(self, calls: dict, deadline: float = None, session_key=None) -> dict:
+        """
+        Args:
+            calls (dict): nombre -> función sin argumentos que realiza la búsqueda.
+            deadline (float): Segundos máximos para toda la operación.
+            session_key: Sesión para el reparto por turnos del governor.
+
+        Returns:
+            dict: nombre -> resultado, o None si falló o no llegó antes del plazo.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        hedge_delay = self.hedge_delay()
+
+        results = {}
+        pending = {}  # future -> nombre
+        started = {}  # nombre -> inicio de la primera copia, completado por los hilos del pool
+        hedged = set()
+        for name, fn in calls.items():
+            pending[self._pool.submit(self._timed, name, fn, started, session_key)] = name
+
+        while len(results) < len(calls):
+            now = time.monotonic()
+            if now >= deadline_at:
+                break
+            waits = [deadline_at]
+            queue_busy = self._queue_busy()
+            for n in calls:
+                if n in results or n in hedged:
+                    continue
+                if queue_busy or n not in started:
+                    waits.append(now + 0.05)  # todavía esperando lugar: se vuelve a mirar en breve
+                else:
+                    waits.append(started[n] + hedge_delay)
+            timeout = max(0.0, min(waits) - now)
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                if name in results:
+                    continue
+                try:
+                    results[name] = future.result()
+                except OverloadedError:
+                    raise
+                except Exception as e:
+                    logger.error(f"{self.name} search '{name}' failed: {e}")
+                    if name not in pending.values():
+                        results[name] = None
+
+            if self._queue_busy():
+                continue  # un hedge sólo agregaría carga a un upstream que ya tiene cola
+            now = time.monotonic()
+            for name, fn in calls.items():
+                if name not in results and name not in hedged and name in started \
+                        and now >= started[name] + hedge_delay:
+                    hedged.add(name)
+                    metrics.increment(f"{self.name}_hedges")
+                    logger.info(f"{self.name} search '{name}' slower than {hedge_delay:.2f}s, sending hedge")
+                    pending[self._pool.submit(self._timed, name, fn, started, session_key)] = name
+
+        missing = [name for name in calls if name not in results]
+        if missing:
+            metrics.increment(f"{self.name}_deadline_exceeded")
+            logger.warning(f"{self.name} deadline reached; continuing without {missing}")
+        return {name: results.get(name) for name in calls}
@@ -0,0 +1,131 @@
+# classes/history_compactor.py
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.metrics import metrics
+from classes.governor import openai_governor, OverloadedError
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Eres un asistente que resume conversaciones clínicas de forma fiel y concisa.
+Actualiza el resumen de la conversación incorporando los nuevos turnos.
+Conserva datos del paciente, diagnósticos, fármacos, dosis y decisiones tomadas; omite saludos y repeticiones.
+Escribe como máximo {max_words} palabras, en el idioma de la conversación. Devuelve SOLO el resumen.
+
+Resumen actual:
+{summary}
+
+Nuevos turnos:
+{turns}
+"""
+
+
+class HistoryCompactor:
+    """
+    Resumen acumulado de los turnos antiguos de una conversación.
+
+    Los turnos que salen de la ventana verbatim se pliegan en segundo plano (un solo hilo,
+    en orden) sobre el resumen anterior, de modo que nunca se vuelve a resumir la
+    conversación completa. Mientras un pliegue está pendiente, esos turnos se siguen
+    enviando tal cual; si se acumulan demasiados se descartan los más viejos para que
+    el tamaño del prompt quede acotado.
+
+    El estado acompaña al historial del Asistente dueño: reset() lo descarta junto con él,
+    y un pliegue que termina después de un reset no se guarda.
+    """
+
+    def __init__(self, get_client, model: str = None, keep_turns: int = None, max_summary_tokens: int = None):
+        self.get_client = get_client  # el cliente se resuelve al plegar, no al construir
+        self.model = model or os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+        self.keep_turns = keep_turns or int(os.getenv("HISTORY_KEEP_TURNS", 3))
+        self.max_summary_tokens = max_summary_tokens or int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", 400))
+        self.max_pending = self.keep_turns * 2
+        self.summary = ""
+        self.pending = []  # turnos fuera de la ventana que aún no están en el resumen
+        self.generation = 0  # cambia con cada reset
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-compactor")
+
+    def compact(self, context_history: list) -> list:
+        """
+        Deja en `context_history` sólo los últimos `keep_turns` turnos y programa el
+        pliegue de los que sobran. Devuelve la ventana verbatim.
+        """
+        if len(context_history) <= self.keep_turns:
+            return context_history
+        evicted, recent = context_history[:-self.keep_turns], context_history[-self.keep_turns:]
+        with self._lock:
+            self.pending.extend(evicted)
+            if len(self.pending) > self.max_pending:
+                dropped = len(self.pending) - self.max_pending
+                del self.pending[:dropped]
+                metrics.increment("history_turns_dropped", dropped)
+                logger.warning(f"History summary lagging, dropped {dropped} old turns")
+        self._executor.submit(self._fold)
+        return recent
+
+    def reset(self):
+        """
+        Olvida el resumen y los turnos pendientes (nueva conversación o historial borrado).
+        """
+        with self._lock:
+            self.summary = ""
+            self.pending = []
+            self.generation += 1
+
+    def older_turns(self) -> list:
+        """
+        Turnos anteriores a la ventana verbatim, listos para el prompt: el resumen (como
+        un par pregunta/respuesta) seguido de los turnos que aún no se plegaron.
+        """
+        with self._lock:
+            turns = []
+            if self.summary:
+                turns.append(("Resume la conversación anterior.", self.summary))
+            return turns + list(self.pending)
+
+    def _fold(self):
+        with self._lock:
+            turns = list(self.pending)
+            summary = self.summary
+            generation = self.generation
+        if not turns:
+            return
+
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(self.max_summary_tokens * 0.6),
+            summary=summary or "(vacío)",
+            turns="\n\n".join(f"Usuario: {q}\nAsistente: {a}" for q, a in turns),
+        )
+        start = time.monotonic()
+        try:
+            with openai_governor.slot("history-compactor"):
+                response = self.get_client().chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                    max_tokens=self.max_summary_tokens,
+                )
+            new_summary = response.choices[0].message.content.strip()
+        except OverloadedError:
+            logger.info("OpenAI busy, history summary postponed to the next turn")
+            return
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {e}")
+            return
+        metrics.observe("history_summary", time.monotonic() - start)
+
+        with self._lock:
+            if generation != self.generation:
+                logger.info("Conversation history reset while folding, summary discarded")
+                return
+            # Sólo se quitan los turnos efectivamente plegados (pueden haber llegado otros)
+            for turn in turns:
+                if self.pending and self.pending[0] == turn:
+                    self.pending.pop(0)
+            self.summary = new_summary
+        logger.info(f"Conversation history folded: {len(turns)} turns, summary {len(new_summary)} chars")
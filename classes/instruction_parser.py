@@ -1,5 +1,7 @@
+import os
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 class InstructionParser:
@@ -8,6 +10,37 @@ class InstructionParser:
         Initialize the InstructionParser with the path to the JSON file.
         """
         self.filepath = filepath
+        self.version = None  # mtime of the file the cached instruction was rendered from
+        self._instruction = None
+        self._lock = threading.Lock()
+
+    def get_instruction(self) -> str:
+        """
+        Return the rendered instruction, re-rendering it only when the file's mtime changes.
+        The rendered string is byte-stable between changes, so it can serve as a cacheable
+        prompt prefix.
+        """
+        try:
+            mtime = os.stat(self.filepath).st_mtime_ns
+        except FileNotFoundError:
+            if self._instruction is not None:
+                logger.error(f"Instruction file {self.filepath} not found, keeping previous version.")
+                return self._instruction
+            raise
+
+        if mtime != self.version:
+            with self._lock:
+                if mtime != self.version:
+                    try:
+                        self._instruction = self.load_instruction()
+                        self.version = mtime
+                        logger.info(f"Instructions loaded from {self.filepath} (version {mtime})")
+                    except Exception:
+                        if self._instruction is None:
+                            raise
+                        self.version = mtime  # don't re-parse the broken file on every request
+                        logger.error("Invalid instruction file, keeping previous version.")
+        return self._instruction
 
     def load_instruction(self) -> str:
         """
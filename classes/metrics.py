@@ -0,0 +1,71 @@
+# classes/metrics.py
+import threading
+from collections import deque
+
+
+class Metrics:
+    """
+    Contadores y latencias en memoria del proceso, expuestos en /metrics.
+    """
+    _instance = None  # Class-level attribute to hold the single instance
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance._counters = {}
+            cls._instance._timings = {}
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float, window: int = 1000):
+        """
+        Registra una duración; se conservan las últimas `window` para calcular percentiles.
+        """
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=window)
+            samples.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: sorted(samples) for name, samples in self._timings.items()}
+
+        summary = {}
+        for name, values in timings.items():
+            if not values:
+                continue
+            summary[name] = {
+                "count": len(values),
+                "p50": values[int(0.50 * (len(values) - 1))],
+                "p95": values[int(0.95 * (len(values) - 1))],
+                "p99": values[int(0.99 * (len(values) - 1))],
+                "max": values[-1],
+            }
+        return {"counters": counters, "timings": summary}
+
+
+def process_rss_mib() -> float:
+    """
+    Memoria residente del proceso actual en MiB (de /proc en Linux, o el pico vía resource).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+metrics = Metrics()
@@ -0,0 +1,89 @@
+# classes/model_router.py
+import os
+import re
+import logging
+import threading
+from collections import namedtuple
+
+from classes.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+RouteDecision = namedtuple("RouteDecision", ["tier", "model", "reason"])
+
+GREETINGS = {
+    "hola", "buenas", "buenos dias", "buenas tardes", "buenas noches", "gracias",
+    "muchas gracias", "ok", "okay", "perfecto", "adios", "chau", "hello", "hi", "thanks"
+}
+
+# Términos que indican una pregunta clínica que requiere razonamiento
+COMPLEX_MARKERS = re.compile(
+    r"\b(diagnostic\w*|tratamiento\w*|diferencia\w*|compar\w*|manejo|dosis|"
+    r"fisiopatologi\w*|pronostic\w*|etiologi\w*|indicacion\w*|contraindicacion\w*|"
+    r"caso|paciente|sintomas|interpret\w*|por que|explica\w*)\b"
+)
+
+
+class ModelRouter:
+    """
+    Elige el modelo de cada petición: un modelo rápido para saludos, preguntas meta y
+    consultas sin RAG, y el modelo de razonamiento para preguntas clínicas con RAG.
+    Registra las decisiones y la latencia por nivel para poder ajustar las reglas.
+    """
+
+    def __init__(self):
+        self.models = {
+            "fast": os.getenv("MODEL_FAST", "gpt-4o-mini"),
+            "heavy": os.getenv("MODEL_HEAVY", "o1-preview-2024-09-12"),
+        }
+        self.min_heavy_words = int(os.getenv("MODEL_ROUTER_MIN_HEAVY_WORDS", 6))
+        self._stats = {tier: {"count": 0, "ttft": 0.0, "total": 0.0} for tier in self.models}
+        self._lock = threading.Lock()
+
+    def route(self, query: str, is_rag: bool, context_history=()) -> RouteDecision:
+        """
+        Decide el nivel de modelo a partir de la decisión de RAG, el largo y la complejidad
+        de la consulta y el estado de la conversación.
+        """
+        normalized = normalize_question(query)
+        words = len(normalized.split())
+
+        if normalized in GREETINGS:
+            decision = self._decision("fast", "greeting")
+        elif not is_rag:
+            decision = self._decision("fast", "no_rag")
+        elif COMPLEX_MARKERS.search(normalized):
+            decision = self._decision("heavy", "rag_clinical")
+        elif words >= self.min_heavy_words:
+            decision = self._decision("heavy", "rag_long")
+        elif context_history:
+            # Seguimiento corto dentro de una conversación clínica ya iniciada
+            decision = self._decision("heavy", "rag_followup")
+        else:
+            decision = self._decision("fast", "rag_short")
+
+        logger.info(f"Model route: tier={decision.tier} model={decision.model} "
+                    f"reason={decision.reason} words={words} rag={is_rag}")
+        return decision
+
+    def _decision(self, tier: str, reason: str) -> RouteDecision:
+        return RouteDecision(tier, self.models[tier], reason)
+
+    def record(self, tier: str, ttft: float, total: float):
+        """
+        Acumula la latencia (tiempo al primer token y total) de una respuesta.
+        """
+        with self._lock:
+            stats = self._stats[tier]
+            stats["count"] += 1
+            stats["ttft"] += ttft
+            stats["total"] += total
+            count = stats["count"]
+            avg_ttft = stats["ttft"] / count
+            avg_total = stats["total"] / count
+        logger.info(f"Model tier={tier}: ttft={ttft:.3f}s total={total:.3f}s "
+                    f"(avg over {count}: ttft={avg_ttft:.3f}s total={avg_total:.3f}s)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {tier: dict(values) for tier, values in self._stats.items()}
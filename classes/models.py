@@ -9,7 +9,16 @@ class Feedback(db.Model):
     respuesta = db.Column(db.Text, nullable=False)
     evaluacion = db.Column(db.String(10), nullable=False)  # "up" o "down"
     motivo = db.Column(db.Text, nullable=True)  # Razón para thumbs-down
-    #marker = db.Column(db.String(100), nullable=True, default="Infectologia")
+    marker = db.Column(db.String(100), nullable=True)  # Especialidad de la respuesta (None: la por defecto)
 
     def __repr__(self):
-        return f"<Feedback {self.id}>"
\ No newline at end of file
+        return f"<Feedback {self.id}>"
+
+
+class OsmaSession(db.Model):
+    id = db.Column(db.String(64), primary_key=True)  # Identificador de sesión entregado al cliente
+    estado = db.Column(db.Text, nullable=False)  # Estado del diálogo OSMA serializado en JSON
+    actualizado = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<OsmaSession {self.id}>"
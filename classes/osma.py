@@ -4,12 +4,15 @@ import json
 from dateutil.relativedelta import relativedelta
 import datetime
 
+from classes.osma_series import OsmaSeries
+
 class Osma:
 
-    def __init__(self, region='us-east-1', profile_name='default'):
+    def __init__(self, region='us-east-1', profile_name='default', cache=None):
         self.region = region
         self.profile_name = profile_name
         self.accessToken = None
+        self.cache = cache  # OsmaCache opcional para no volver a descargar rangos ya consultados
 
     def authenticate_and_get_access_token_via_api(self, username, password):
 
@@ -95,15 +98,8 @@ class Osma:
             return self.getDatosVariableNotDivided(idVariable, fechaInicio, fechaFin, interval)
         else:
             allData = None
-            fini = fechaInicio
-
-            while True:
-                ffin = fechaFin
-                fendTemp = fini + relativedelta(months=monthInterval)
-
-                if fendTemp < ffin:
-                    ffin = fendTemp
 
+            for fini, ffin in self.ventanasFechas(fechaInicio, fechaFin, monthInterval):
                 response = self.getDatosVariableNotDivided(idVariable, fini, ffin, interval)
 
                 if response != None:
@@ -113,12 +109,73 @@ class Osma:
                         allData['values'].extend(response['values'])
                         allData['date'].extend(response['date'])
 
-                fini = fendTemp
+            return allData
 
-                if fendTemp >= fechaFin:
-                    break
+    def ventanasFechas(self, fechaInicio, fechaFin, monthInterval=-1):
+        """
+        Divide el rango [fechaInicio, fechaFin] en ventanas de monthInterval meses.
+        """
+        if monthInterval < 1:
+            yield fechaInicio, fechaFin
+            return
 
-            return allData
+        fini = fechaInicio
+        while True:
+            ffin = fechaFin
+            fendTemp = fini + relativedelta(months=monthInterval)
+
+            if fendTemp < ffin:
+                ffin = fendTemp
+
+            yield fini, ffin
+
+            fini = fendTemp
+
+            if fendTemp >= fechaFin:
+                break
+
+    def getSerieVariable(self, idVariable, fechaInicio, fechaFin, interval,
+                         monthInterval=-1):
+        """
+        Igual que getDatosVariable, pero devuelve una OsmaSeries columnar
+        (datetime64 + float64) en lugar de listas de Python.
+        Si hay caché configurada, sólo se descargan los tramos que faltan.
+        """
+        if self.cache is not None:
+            return self.cache.get_serie(
+                idVariable, interval, fechaInicio, fechaFin,
+                lambda fini, ffin: self.descargarVentanas(idVariable, fini, ffin, interval, monthInterval)
+            )
+        return self.descargarSerie(idVariable, fechaInicio, fechaFin, interval, monthInterval)
+
+    def descargarVentanas(self, idVariable, fechaInicio, fechaFin, interval, monthInterval=-1):
+        """
+        Descarga la serie ventana por ventana y genera (fini, ffin, OsmaSeries); la serie
+        es None cuando la API no devolvió datos para esa ventana.
+        """
+        for fini, ffin in self.ventanasFechas(fechaInicio, fechaFin, monthInterval):
+            response = self.getDatosVariableNotDivided(idVariable, fini, ffin, interval)
+            yield fini, ffin, OsmaSeries.from_response(response)
+
+    def descargarSerie(self, idVariable, fechaInicio, fechaFin, interval, monthInterval=-1):
+        return OsmaSeries.concat(
+            [serie for _, _, serie in self.descargarVentanas(idVariable, fechaInicio, fechaFin, interval, monthInterval)]
+        )
+
+    def getSeriesVariableIntervalos(self, idVariable, fechaInicio, fechaFin, intervalos,
+                                    monthInterval=-1, how="mean"):
+        """
+        Descarga la variable una sola vez a resolución de minuto y la remuestrea
+        localmente a cada intervalo pedido ("Minuto", "Hora", "Día", "Mes").
+
+        Returns:
+            dict: intervalo -> OsmaSeries (None si la API no devolvió datos).
+        """
+        serie = self.getSerieVariable(idVariable, fechaInicio, fechaFin, "MIN", monthInterval)
+        if serie is None:
+            return {intervalo: None for intervalo in intervalos}
+        serie = serie.sorted()
+        return {intervalo: serie.resample(intervalo, how) for intervalo in intervalos}
 
     def getDatosVariableNotDivided(self, idVariable, fechaInicio, fechaFin, interval):
         dateInicio = fechaInicio.strftime("%Y-%m-%d")
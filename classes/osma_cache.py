@@ -0,0 +1,202 @@
+# File: classes/osma_cache.py
+
+import os
+import logging
+import tempfile
+import datetime
+import numpy as np
+
+from classes.osma_series import OsmaSeries, INTERVAL_UNITS
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de cada segmento en disco según la unidad del intervalo: un mes de minutos,
+# un año de horas, días o meses. Así leer o agregar una ventana nunca carga toda la serie.
+SEGMENT_UNITS = {"m": "M", "h": "Y", "D": "Y", "M": "Y"}
+
+
+class OsmaCache:
+    """
+    Caché en disco de series OSMA, por idVariable e intervalo.
+
+    Cada variable tiene un directorio con un .npz por segmento (ver SEGMENT_UNITS) y un
+    coverage.npy con los rangos [inicio, fin] cubiertos, de modo que una nueva consulta
+    sólo descarga los tramos que faltan. Cada ventana descargada se agrega en cuanto
+    llega, reescribiendo sólo los segmentos que toca.
+
+    Sólo se marcan como cubiertas las ventanas que la API devolvió y hasta el último dato
+    definitivo (ver final_until): lo que falló o todavía puede cambiar se vuelve a pedir.
+    """
+
+    def __init__(self, cache_dir: str = None, lag_minutes: int = None):
+        if cache_dir is None:
+            cache_dir = os.getenv("OSMA_CACHE_DIR") or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "..", "osma_cache"
+            )
+        self.cache_dir = cache_dir
+        # Margen antes de "ahora" para datos que la API todavía puede estar completando
+        self.lag_minutes = lag_minutes if lag_minutes is not None else int(os.getenv("OSMA_CACHE_LAG_MINUTES", 30))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _dir(self, idVariable, interval) -> str:
+        return os.path.join(self.cache_dir, f"{int(idVariable)}_{interval}")
+
+    @staticmethod
+    def _segment_unit(interval) -> str:
+        return SEGMENT_UNITS[INTERVAL_UNITS.get(interval, "m")]
+
+    def _segment_path(self, idVariable, interval, segment) -> str:
+        return os.path.join(self._dir(idVariable, interval), f"{segment}.npz")
+
+    def _atomic_write(self, path, write):
+        """
+        Escribe path de forma atómica con write(archivo).
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Un archivo temporal propio por escritura: varios workers pueden guardar la misma variable
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp" + os.path.splitext(path)[1], delete=False) as tmp:
+            write(tmp)
+        try:
+            os.replace(tmp.name, path)
+        except OSError:
+            os.remove(tmp.name)
+            raise
+
+    def load_coverage(self, idVariable, interval):
+        """
+        Rangos (inicio, fin) cubiertos para la variable, o [] si no hay caché.
+        """
+        path = os.path.join(self._dir(idVariable, interval), "coverage.npy")
+        if not os.path.exists(path):
+            return []
+        try:
+            return [tuple(r) for r in np.load(path, allow_pickle=False)]
+        except Exception as e:
+            logger.error(f"Error al leer la caché OSMA {path}: {e}")
+            return []
+
+    def _save_coverage(self, idVariable, interval, coverage):
+        path = os.path.join(self._dir(idVariable, interval), "coverage.npy")
+        coverage_arr = np.array(coverage, dtype="datetime64[m]").reshape(-1, 2)
+        self._atomic_write(path, lambda f: np.save(f, coverage_arr))
+
+    def _load_segment(self, idVariable, interval, segment):
+        path = self._segment_path(idVariable, interval, segment)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return OsmaSeries(data["dates"], data["values"], str(data["variable"]) or None)
+        except Exception as e:
+            logger.error(f"Error al leer la caché OSMA {path}: {e}")
+            return None
+
+    def _save_segment(self, idVariable, interval, segment, serie):
+        self._atomic_write(
+            self._segment_path(idVariable, interval, segment),
+            lambda f: np.savez(f, dates=serie.dates, values=serie.values, variable=np.array(serie.variable or "")),
+        )
+
+    def load_range(self, idVariable, interval, fechaInicio, fechaFin):
+        """
+        Serie guardada en [fechaInicio, fechaFin], leyendo sólo los segmentos del rango;
+        None si no hay datos guardados.
+        """
+        unit = self._segment_unit(interval)
+        first = np.datetime64(fechaInicio, "m").astype(f"datetime64[{unit}]")
+        last = np.datetime64(fechaFin, "m").astype(f"datetime64[{unit}]")
+        segments = [
+            self._load_segment(idVariable, interval, segment)
+            for segment in np.arange(first, last + np.timedelta64(1, unit))
+        ]
+        serie = OsmaSeries.concat(segments)
+        if serie is None:
+            return None
+        return serie.slice(fechaInicio, fechaFin)
+
+    def final_until(self, interval):
+        """
+        Último minuto con datos definitivos: anterior al margen de seguridad y al intervalo
+        (minuto, hora, día o mes) que todavía está abierto.
+        """
+        now = np.datetime64(datetime.datetime.now(), "m") - np.timedelta64(self.lag_minutes, "m")
+        open_bucket = now.astype(f"datetime64[{INTERVAL_UNITS.get(interval, 'm')}]").astype("datetime64[m]")
+        return open_bucket - np.timedelta64(1, "m")
+
+    def store_window(self, idVariable, interval, fechaInicio, fechaFin, serie):
+        """
+        Agrega una ventana descargada: la mezcla con los segmentos que toca (ante fechas
+        repetidas gana lo nuevo) y marca la ventana como cubierta. Una ventana sin serie
+        (la API no respondió) no se guarda ni se marca.
+        """
+        if serie is None:
+            return
+        unit = self._segment_unit(interval)
+        buckets = serie.dates.astype(f"datetime64[{unit}]")
+        for segment in np.unique(buckets):
+            mask = buckets == segment
+            part = OsmaSeries(serie.dates[mask], serie.values[mask], serie.variable)
+            merged = OsmaSeries.concat([self._load_segment(idVariable, interval, segment), part]).sorted()
+            self._save_segment(idVariable, interval, segment, merged)
+
+        start, end = np.datetime64(fechaInicio, "m"), np.datetime64(fechaFin, "m")
+        final = self.final_until(interval)
+        if start <= final:
+            # Se relee la cobertura: otro worker pudo haber agregado ventanas mientras tanto
+            coverage = self.load_coverage(idVariable, interval) + [(start, min(end, final))]
+            self._save_coverage(idVariable, interval, self.merge_ranges(coverage))
+
+    @staticmethod
+    def merge_ranges(ranges):
+        """
+        Une rangos [inicio, fin] que se solapan o se tocan.
+        """
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def missing_ranges(coverage, start, end):
+        """
+        Calcula los sub-rangos de [start, end] que no están cubiertos por coverage.
+        """
+        missing = []
+        cursor = start
+        for c_start, c_end in OsmaCache.merge_ranges(coverage):
+            if c_end < cursor:
+                continue
+            if c_start > end:
+                break
+            if c_start > cursor:
+                missing.append((cursor, c_start))
+            cursor = max(cursor, c_end)
+        if cursor < end:
+            missing.append((cursor, end))
+        return missing
+
+    def get_serie(self, idVariable, interval, fechaInicio, fechaFin, fetch):
+        """
+        Devuelve la serie de [fechaInicio, fechaFin] descargando sólo los tramos faltantes.
+
+        Args:
+            fetch (callable): fetch(fini, ffin) -> iterable de (inicio, fin, OsmaSeries o None),
+                una tupla por ventana consultada a la API.
+        """
+        start = np.datetime64(fechaInicio, "m")
+        end = np.datetime64(fechaFin, "m")
+
+        gaps = self.missing_ranges(self.load_coverage(idVariable, interval), start, end)
+        if gaps:
+            logger.info(f"Caché OSMA {idVariable}/{interval}: descargando {len(gaps)} tramo(s) faltante(s)")
+            for g_start, g_end in gaps:
+                for w_start, w_end, serie in fetch(g_start.astype(datetime.datetime), g_end.astype(datetime.datetime)):
+                    self.store_window(idVariable, interval, w_start, w_end, serie)
+        else:
+            logger.info(f"Caché OSMA {idVariable}/{interval}: rango completo en caché")
+
+        return self.load_range(idVariable, interval, fechaInicio, fechaFin)
@@ -0,0 +1,147 @@
+# File: classes/osma_catalog.py
+
+import os
+import json
+import logging
+import time
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+
+class OsmaCatalog:
+    """
+    Catálogo OSMA (servicio -> monitoreable -> variables) cargado una sola vez por proceso.
+
+    Los índices son inmutables y las listas de opciones ya vienen ordenadas, de modo que
+    cada paso del flujo OSMA es una búsqueda en diccionario en lugar de recorrer todo el JSON.
+
+    Si la carga falla (o el catálogo viene vacío) no se guarda: se devuelve un catálogo
+    vacío y se reintenta en un acceso posterior, esperando cada vez más entre intentos.
+    """
+    _instance = None  # Catálogo compartido por todas las sesiones del proceso
+    _lock = threading.Lock()
+    _empty = None  # Catálogo vacío devuelto mientras no se pudo cargar el real
+    _retry_at = 0.0
+    _retry_delay = 0.0
+    RETRY_MIN = float(os.getenv("OSMA_CATALOG_RETRY_MIN", 5))
+    RETRY_MAX = float(os.getenv("OSMA_CATALOG_RETRY_MAX", 300))
+
+    def __init__(self, data: dict):
+        monitoreables_by_service = {}
+        variables_by_pair = {}
+        id_by_variable = {}
+        id_by_key = {}
+
+        for servicio, monitoreables in data.items():
+            monitoreables_by_service[servicio] = tuple(sorted(monitoreables.keys()))
+            for monitoreable, variables in monitoreables.items():
+                names = []
+                for var_item in variables:
+                    name = var_item.get("Variable")
+                    id_variable = var_item.get("idVariable")
+                    if name is None or id_variable is None:
+                        continue
+                    id_variable = int(id_variable)
+                    names.append(name)
+                    id_by_key[(servicio, monitoreable, name)] = id_variable
+                    id_by_variable.setdefault(name, id_variable)
+                variables_by_pair[(servicio, monitoreable)] = tuple(sorted(set(names)))
+
+        self.services = tuple(sorted(data.keys()))
+        self.monitoreables_by_service = MappingProxyType(monitoreables_by_service)
+        self.variables_by_pair = MappingProxyType(variables_by_pair)
+        self.id_by_variable = MappingProxyType(id_by_variable)
+        self.id_by_key = MappingProxyType(id_by_key)
+        self._search_index = None
+
+    @classmethod
+    def get(cls, json_path: str = None):
+        """
+        Devuelve el catálogo del proceso, leyendo osma_data.json hasta que la carga funcione.
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    return cls._try_load(json_path)
+        return cls._instance
+
+    @classmethod
+    def _try_load(cls, json_path: str = None):
+        if cls._empty is None:
+            cls._empty = cls({})
+        now = time.monotonic()
+        if now < cls._retry_at:
+            return cls._empty
+        data = cls._read_json(json_path)
+        if not data:
+            cls._retry_delay = min(cls.RETRY_MAX, cls._retry_delay * 2 or cls.RETRY_MIN)
+            cls._retry_at = now + cls._retry_delay
+            logger.warning(f"Catálogo OSMA vacío o no disponible, nuevo intento en {cls._retry_delay:.0f}s")
+            return cls._empty
+        cls._instance = cls(data)
+        cls._retry_delay = 0.0
+        return cls._instance
+
+    @staticmethod
+    def _read_json(json_path: str = None) -> dict:
+        if json_path is None:
+            json_path = os.path.join(os.path.dirname(__file__), '..', 'osma_data.json')
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            logger.info(f"Archivo de OSMA cargado desde: {json_path}")
+            return data
+        except Exception as e:
+            logger.error(f"Error al cargar el archivo JSON de OSMA: {e}")
+            return {}
+
+    @property
+    def search_index(self):
+        """
+        Índice de búsqueda aproximada, construido la primera vez que se usa.
+        """
+        if self._search_index is None:
+            with self._lock:
+                if self._search_index is None:
+                    from classes.osma_search import OsmaSearchIndex
+                    self._search_index = OsmaSearchIndex(self)
+        return self._search_index
+
+    def has_service(self, servicio: str) -> bool:
+        return servicio in self.monitoreables_by_service
+
+    def has_monitoreable(self, servicios, monitoreable: str) -> bool:
+        return any((serv, monitoreable) in self.variables_by_pair for serv in servicios)
+
+    def monitoreables_for(self, servicios) -> list:
+        """
+        Opciones de monitoreables para los servicios seleccionados, ordenadas.
+        """
+        if len(servicios) == 1:
+            return list(self.monitoreables_by_service.get(servicios[0], ()))
+        result = set()
+        for serv in servicios:
+            result.update(self.monitoreables_by_service.get(serv, ()))
+        return sorted(result)
+
+    def variables_for(self, servicios, monitoreables) -> list:
+        """
+        Opciones de variables para los pares (servicio, monitoreable) seleccionados, ordenadas.
+        """
+        result = set()
+        for serv in servicios:
+            for mon in monitoreables:
+                result.update(self.variables_by_pair.get((serv, mon), ()))
+        return sorted(result)
+
+    def id_variable(self, variable: str, servicio: str = None, monitoreable: str = None):
+        """
+        Devuelve el idVariable de una variable, usando servicio y monitoreable si se conocen.
+        """
+        if servicio is not None and monitoreable is not None:
+            id_variable = self.id_by_key.get((servicio, monitoreable, variable))
+            if id_variable is not None:
+                return id_variable
+        return self.id_by_variable.get(variable)
@@ -0,0 +1,164 @@
+# File: classes/osma_export.py
+
+import os
+import logging
+import numpy as np
+
+from classes.osma import Osma
+from classes.osma_cache import OsmaCache
+from classes.osma_series import OsmaSeries
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional; sin él sólo se exporta CSV
+    pa = None
+    pq = None
+
+
+class _StreamSink:
+    """
+    Archivo de sólo escritura que acumula bytes para entregarlos por partes.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class OsmaExporter:
+    """
+    Exporta las series de varias variables OSMA como CSV o Parquet en streaming.
+
+    Los datos se descargan ventana por ventana y cada ventana se escribe en cuanto llega,
+    así la memoria se mantiene constante y la descarga empieza antes de la última ventana.
+    """
+
+    FORMATS = ("csv", "parquet")
+
+    def __init__(self, osma: Osma, month_interval: int = 1):
+        self.osma = osma
+        self.month_interval = month_interval
+
+    @classmethod
+    def from_env(cls):
+        """
+        Crea un exportador autenticado con OSMA_USER / OSMA_PASSWORD.
+        """
+        osma = Osma(cache=OsmaCache())
+        if not osma.authenticate_and_get_access_token_via_api(os.getenv("OSMA_USER"), os.getenv("OSMA_PASSWORD")):
+            raise ValueError("No se pudo autenticar contra la API de OSMA.")
+        return cls(osma)
+
+    @staticmethod
+    def parquet_available() -> bool:
+        return pa is not None
+
+    def iter_windows(self, variables, fechaInicio, fechaFin, interval):
+        """
+        Recorre (variable, OsmaSeries) ventana por ventana, para todas las variables pedidas.
+
+        Las ventanas ya cubiertas se leen de la caché (sólo los segmentos de la ventana) y
+        las demás se descargan y se guardan en la caché apenas llegan, así en memoria hay
+        una ventana por vez y lo descargado no se pierde si el cliente corta la descarga.
+
+        Args:
+            variables (list): Diccionarios con idVariable, servicio, monitoreable y variable.
+        """
+        cache = self.osma.cache
+        for var in variables:
+            idVariable = var["idVariable"]
+            coverage = cache.load_coverage(idVariable, interval) if cache is not None else []
+            last = None
+            for fini, ffin in self.osma.ventanasFechas(fechaInicio, fechaFin, self.month_interval):
+                start, end = np.datetime64(fini, "m"), np.datetime64(ffin, "m")
+                if cache is not None and not cache.missing_ranges(coverage, start, end):
+                    serie = cache.load_range(idVariable, interval, fini, ffin)
+                else:
+                    series = []
+                    for w_start, w_end, window in self.osma.descargarVentanas(idVariable, fini, ffin, interval):
+                        if cache is not None:
+                            cache.store_window(idVariable, interval, w_start, w_end, window)
+                        series.append(window)
+                    serie = OsmaSeries.concat(series)
+                if serie is None:
+                    continue
+                if last is not None:
+                    # Las ventanas consecutivas comparten el instante del borde
+                    serie = serie.slice(last + np.timedelta64(1, "m"), ffin)
+                if len(serie) == 0:
+                    continue
+                last = serie.dates[-1]
+                yield var, serie
+
+    def iter_csv(self, variables, fechaInicio, fechaFin, interval):
+        yield "idVariable,servicio,monitoreable,variable,fecha,valor\n"
+        for var, serie in self.iter_windows(variables, fechaInicio, fechaFin, interval):
+            prefix = ",".join(
+                self._csv_field(var[k]) for k in ("idVariable", "servicio", "monitoreable", "variable")
+            )
+            fechas = np.datetime_as_string(serie.dates, unit="m")
+            yield "".join(f"{prefix},{f},{v!r}\n" for f, v in zip(fechas, serie.values.tolist()))
+
+    def iter_parquet(self, variables, fechaInicio, fechaFin, interval):
+        if pa is None:
+            raise RuntimeError("La exportación Parquet requiere pyarrow.")
+
+        schema = pa.schema([
+            ("idVariable", pa.int64()),
+            ("servicio", pa.string()),
+            ("monitoreable", pa.string()),
+            ("variable", pa.string()),
+            ("fecha", pa.timestamp("s")),
+            ("valor", pa.float64()),
+        ])
+        sink = _StreamSink()
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+        try:
+            for var, serie in self.iter_windows(variables, fechaInicio, fechaFin, interval):
+                n = len(serie)
+                table = pa.table({
+                    "idVariable": pa.array(np.full(n, int(var["idVariable"]), dtype=np.int64)),
+                    "servicio": pa.array([var["servicio"]] * n, pa.string()),
+                    "monitoreable": pa.array([var["monitoreable"]] * n, pa.string()),
+                    "variable": pa.array([var["variable"]] * n, pa.string()),
+                    "fecha": pa.array(serie.dates.astype("datetime64[s]")),
+                    "valor": pa.array(serie.values),
+                }, schema=schema)
+                writer.write_table(table)  # un row group por ventana
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def _csv_field(value) -> str:
+        value = str(value)
+        if any(c in value for c in ',"\n'):
+            value = '"' + value.replace('"', '""') + '"'
+        return value
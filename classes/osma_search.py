@@ -0,0 +1,77 @@
+# File: classes/osma_search.py
+
+import logging
+import unicodedata
+import numpy as np
+from rapidfuzz import process, fuzz
+
+logger = logging.getLogger(__name__)
+
+
+def fold_text(text: str) -> str:
+    """
+    Normaliza un texto para búsqueda: minúsculas, sin tildes y con espacios simples.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().replace(",", " ").replace("_", " ").split())
+
+
+class OsmaSearchIndex:
+    """
+    Índice de búsqueda sobre servicio + monitoreable + variable del catálogo OSMA.
+
+    Los textos se pliegan (sin tildes, minúsculas) una sola vez al construir el índice y las
+    consultas se puntúan en lote con rapidfuzz.cdist, de modo que una frase libre como
+    "temperatura agua caliente bloque quirúrgico" se resuelve a idVariable candidatos.
+    """
+
+    def __init__(self, catalog):
+        self.entries = []  # (servicio, monitoreable, variable, idVariable)
+        for (servicio, monitoreable, variable), id_variable in catalog.id_by_key.items():
+            self.entries.append((servicio, monitoreable, variable, id_variable))
+        self.choices = [fold_text(f"{s} {m} {v}") for s, m, v, _ in self.entries]
+        logger.info(f"Índice de búsqueda OSMA construido con {len(self.entries)} variables")
+
+    def search_many(self, queries, limit: int = 5, score_cutoff: float = 60):
+        """
+        Puntúa varias consultas a la vez contra todo el catálogo.
+
+        Returns:
+            list: Para cada consulta, lista de candidatos ordenados por puntaje descendente.
+        """
+        if not self.entries or not queries:
+            return [[] for _ in queries]
+
+        folded = [fold_text(q) for q in queries]
+        scores = process.cdist(folded, self.choices, scorer=fuzz.token_set_ratio,
+                               dtype=np.uint8, workers=-1)
+
+        results = []
+        k = min(limit, len(self.entries))
+        for query, row in zip(folded, scores):
+            # argpartition evita ordenar las decenas de miles de puntajes completos; se
+            # conservan todos los empatados con el k-ésimo puntaje para desempatar antes de cortar
+            kth_score = row[np.argpartition(row, -k)[-k]]
+            top = np.flatnonzero(row >= max(kth_score, score_cutoff))
+            # Desempate por similitud global, para preferir la variable más específica
+            ranked = sorted(
+                top,
+                key=lambda i: (int(row[i]), fuzz.ratio(query, self.choices[i])),
+                reverse=True
+            )[:k]
+            candidates = []
+            for i in ranked:
+                servicio, monitoreable, variable, id_variable = self.entries[i]
+                candidates.append({
+                    "idVariable": id_variable,
+                    "servicio": servicio,
+                    "monitoreable": monitoreable,
+                    "variable": variable,
+                    "score": int(row[i]),
+                })
+            results.append(candidates)
+        return results
+
+    def search(self, query: str, limit: int = 5, score_cutoff: float = 60):
+        return self.search_many([query], limit=limit, score_cutoff=score_cutoff)[0]
@@ -0,0 +1,156 @@
+# File: classes/osma_series.py
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Unidad numpy correspondiente a cada intervalo (nombres del formulario OSMA y códigos de la API)
+INTERVAL_UNITS = {
+    "Minuto": "m",
+    "Hora": "h",
+    "Día": "D",
+    "Mes": "M",
+    "MIN": "m",
+    "HOUR": "h",
+    "DAY": "D",
+    "MONTH": "M",
+}
+
+# Código de la API de OSMA para cada intervalo del formulario
+INTERVAL_CODES = {
+    "Minuto": "MIN",
+    "Hora": "HOUR",
+    "Día": "DAY",
+    "Mes": "MONTH",
+}
+
+
+class OsmaSeries:
+    """
+    Serie temporal columnar de una variable OSMA.
+
+    Guarda las fechas como datetime64[m] y los valores como float64, en lugar de
+    listas de strings/floats de Python, y permite remuestrear localmente a
+    Hora/Día/Mes sin volver a consultar la API.
+    """
+
+    def __init__(self, dates, values, variable=None):
+        self.dates = np.asarray(dates, dtype="datetime64[m]")
+        self.values = np.asarray(values, dtype=np.float64)
+        self.variable = variable
+
+        if self.dates.shape != self.values.shape:
+            raise ValueError("Las columnas de fechas y valores deben tener el mismo largo.")
+
+    @classmethod
+    def empty(cls, variable=None):
+        return cls(np.empty(0, dtype="datetime64[m]"), np.empty(0, dtype=np.float64), variable)
+
+    @classmethod
+    def from_response(cls, varData):
+        """
+        Construye la serie a partir del diccionario devuelto por la API
+        ({'date': [...], 'values': [...], 'variable': ...}).
+        """
+        if varData is None:
+            return None
+        dates = np.array([str(d).replace(" ", "T") for d in varData["date"]], dtype="datetime64[m]")
+        values = np.array(varData["values"], dtype=np.float64)
+        return cls(dates, values, varData.get("variable"))
+
+    @classmethod
+    def concat(cls, series_list):
+        """
+        Concatena varias series (por ejemplo, ventanas mensuales consecutivas).
+        """
+        series_list = [s for s in series_list if s is not None]
+        if not series_list:
+            return None
+        dates = np.concatenate([s.dates for s in series_list])
+        values = np.concatenate([s.values for s in series_list])
+        return cls(dates, values, series_list[0].variable)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.values.nbytes
+
+    def sorted(self):
+        """
+        Devuelve la serie ordenada por fecha y sin marcas de tiempo duplicadas.
+        """
+        if len(self) == 0:
+            return self
+        order = np.argsort(self.dates, kind="stable")
+        dates = self.dates[order]
+        values = self.values[order]
+        keep = np.ones(len(dates), dtype=bool)
+        keep[:-1] = dates[1:] != dates[:-1]  # ante duplicados se queda el último
+        return OsmaSeries(dates[keep], values[keep], self.variable)
+
+    def slice(self, fechaInicio, fechaFin):
+        """
+        Devuelve la sub-serie comprendida en [fechaInicio, fechaFin].
+        """
+        start = np.datetime64(fechaInicio, "m")
+        end = np.datetime64(fechaFin, "m")
+        mask = (self.dates >= start) & (self.dates <= end)
+        return OsmaSeries(self.dates[mask], self.values[mask], self.variable)
+
+    def resample(self, interval, how="mean"):
+        """
+        Remuestrea la serie a un intervalo más grueso de forma vectorizada.
+
+        Args:
+            interval (str): "Minuto", "Hora", "Día", "Mes" (o MIN/HOUR/DAY/MONTH).
+            how (str): Agregación por intervalo: "mean", "sum", "min", "max" o "last".
+
+        Returns:
+            OsmaSeries: Serie con una fila por intervalo con datos.
+        """
+        unit = INTERVAL_UNITS.get(interval)
+        if unit is None:
+            raise ValueError(f"Intervalo no soportado: {interval}")
+        if len(self) == 0:
+            return OsmaSeries.empty(self.variable)
+
+        buckets = self.dates.astype(f"datetime64[{unit}]")
+        keys, inverse = np.unique(buckets, return_inverse=True)
+
+        valid = ~np.isnan(self.values)
+        idx = inverse[valid]
+        vals = self.values[valid]
+        n = len(keys)
+
+        if how == "mean":
+            sums = np.bincount(idx, weights=vals, minlength=n)
+            counts = np.bincount(idx, minlength=n)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out = sums / counts
+        elif how == "sum":
+            out = np.bincount(idx, weights=vals, minlength=n)
+        elif how in ("min", "max"):
+            out = np.full(n, np.inf if how == "min" else -np.inf)
+            ufunc = np.minimum if how == "min" else np.maximum
+            ufunc.at(out, idx, vals)
+            out[np.isinf(out)] = np.nan
+        elif how == "last":
+            out = np.full(n, np.nan)
+            out[idx] = vals  # con fechas ordenadas, la última asignación es el último valor
+        else:
+            raise ValueError(f"Agregación no soportada: {how}")
+
+        return OsmaSeries(keys.astype("datetime64[m]"), out, self.variable)
+
+    def to_dict(self):
+        """
+        Devuelve el formato clásico de la API ({'date', 'values', 'variable'}).
+        """
+        return {
+            "date": np.datetime_as_string(self.dates, unit="m").tolist(),
+            "values": self.values.tolist(),
+            "variable": self.variable,
+        }
@@ -0,0 +1,83 @@
+# File: classes/osma_session_store.py
+
+import os
+import json
+import uuid
+import logging
+import datetime
+
+from classes.models import OsmaSession
+from classes.asistente_osma import AsistenteOSMA
+
+logger = logging.getLogger(__name__)
+
+
+class OsmaSessionStore:
+    """
+    Guarda el estado del diálogo OSMA de cada usuario en la base de datos, con expiración
+    y un número máximo de sesiones. Al estar en la base compartida, cualquier worker puede
+    continuar un flujo iniciado en otro.
+    """
+
+    def __init__(self, db, ttl_seconds: int = None, max_sessions: int = None):
+        self.db = db
+        self.ttl_seconds = ttl_seconds or int(os.getenv("OSMA_SESSION_TTL", 1800))
+        self.max_sessions = max_sessions or int(os.getenv("OSMA_MAX_SESSIONS", 500))
+
+    def create(self, asistente: AsistenteOSMA) -> str:
+        """
+        Registra una nueva sesión y devuelve su identificador.
+        """
+        session_id = uuid.uuid4().hex
+        self.db.session.add(OsmaSession(
+            id=session_id,
+            estado=json.dumps(asistente.to_dict(), ensure_ascii=False),
+            actualizado=datetime.datetime.utcnow()
+        ))
+        self._purge()
+        self.db.session.commit()
+        return session_id
+
+    def get(self, session_id: str):
+        """
+        Devuelve el AsistenteOSMA de la sesión, o None si no existe o expiró.
+        """
+        if not session_id:
+            return None
+        row = self.db.session.get(OsmaSession, session_id)
+        if row is None:
+            return None
+        if row.actualizado < self._cutoff():
+            logger.info(f"Sesión OSMA {session_id} expirada")
+            self.db.session.delete(row)
+            self.db.session.commit()
+            return None
+        return AsistenteOSMA.from_dict(json.loads(row.estado))
+
+    def save(self, session_id: str, asistente: AsistenteOSMA):
+        row = self.db.session.get(OsmaSession, session_id)
+        if row is None:
+            return
+        row.estado = json.dumps(asistente.to_dict(), ensure_ascii=False)
+        row.actualizado = datetime.datetime.utcnow()
+        self.db.session.commit()
+
+    def delete(self, session_id: str):
+        row = self.db.session.get(OsmaSession, session_id)
+        if row is not None:
+            self.db.session.delete(row)
+            self.db.session.commit()
+
+    def _cutoff(self):
+        return datetime.datetime.utcnow() - datetime.timedelta(seconds=self.ttl_seconds)
+
+    def _purge(self):
+        """
+        Elimina las sesiones expiradas y, si se supera el máximo, las más antiguas.
+        """
+        OsmaSession.query.filter(OsmaSession.actualizado < self._cutoff()).delete(synchronize_session=False)
+        overflow = OsmaSession.query.count() - self.max_sessions
+        if overflow > 0:
+            oldest = [row.id for row in OsmaSession.query.order_by(OsmaSession.actualizado).limit(overflow)]
+            OsmaSession.query.filter(OsmaSession.id.in_(oldest)).delete(synchronize_session=False)
+            logger.info(f"Se eliminaron {len(oldest)} sesiones OSMA antiguas (máximo {self.max_sessions})")
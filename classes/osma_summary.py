@@ -0,0 +1,172 @@
+# File: classes/osma_summary.py
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from classes.osma_series import OsmaSeries
+
+logger = logging.getLogger(__name__)
+
+
+def lttb(dates, values, n_out: int):
+    """
+    Downsampling Largest-Triangle-Three-Buckets: conserva picos y forma de la serie
+    con n_out puntos.
+
+    Returns:
+        np.ndarray: Índices de los puntos elegidos.
+    """
+    n = len(values)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.linspace(0, n - 1, max(n_out, 1)).astype(int)
+
+    x = dates.astype("int64").astype(np.float64)
+    y = values
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out-2 buckets interiores
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_start, nxt_end = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+class OsmaSummarizer:
+    """
+    Resume series OSMA en una representación de tamaño acotado apta para el prompt del LLM:
+    estadísticas globales, estadísticas por intervalo, puntos remuestreados con LTTB y
+    marcas de anomalías. Los resúmenes se guardan por (variable, rango, intervalo).
+    """
+
+    def __init__(self, max_points: int = None, max_tokens: int = None, cache_size: int = 256):
+        self.max_points = max_points or int(os.getenv("OSMA_SUMMARY_MAX_POINTS", 60))
+        self.max_tokens = max_tokens or int(os.getenv("OSMA_SUMMARY_MAX_TOKENS", 800))
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Aproximación habitual de ~4 caracteres por token
+        return len(text) // 4 + 1
+
+    def summarize_variable(self, osma, idVariable, fechaInicio, fechaFin, interval, nombre=None):
+        """
+        Descarga (o toma de caché) la variable y devuelve su resumen en texto.
+        """
+        key = (int(idVariable), str(fechaInicio), str(fechaFin), interval, self.max_points, self.max_tokens)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        serie = osma.getSerieVariable(idVariable, fechaInicio, fechaFin, interval)
+        summary = self.summarize(serie, nombre or idVariable)
+
+        with self._lock:
+            self._cache[key] = summary
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def summarize(self, serie: OsmaSeries, nombre=None) -> str:
+        """
+        Construye el resumen de la serie respetando los presupuestos de puntos y tokens.
+        """
+        nombre = nombre or (serie.variable if serie is not None else "")
+        if serie is None or len(serie) == 0:
+            return f"Variable {nombre}: sin datos en el rango solicitado."
+
+        serie = serie.sorted()
+        valid = ~np.isnan(serie.values)
+        serie = OsmaSeries(serie.dates[valid], serie.values[valid], serie.variable)
+        if len(serie) == 0:
+            return f"Variable {nombre}: sin datos válidos en el rango solicitado."
+
+        header = self._header(serie, nombre)
+        anomalies = self._anomalies(serie)
+        periods = self._period_stats(serie)
+
+        max_points = self.max_points
+        while True:
+            idx = lttb(serie.dates, serie.values, max_points)
+            points = "; ".join(
+                f"{d} {v:.4g}" for d, v in zip(np.datetime_as_string(serie.dates[idx], unit="m"), serie.values[idx])
+            )
+            parts = [header]
+            if periods:
+                parts.append(periods)
+            if anomalies:
+                parts.append(anomalies)
+            parts.append(f"Puntos representativos ({len(idx)}): {points}")
+            text = "\n".join(parts)
+            if self.estimate_tokens(text) <= self.max_tokens:
+                return text
+            if max_points <= 5:
+                if periods:
+                    # Sin margen ni con el mínimo de puntos: se descartan las estadísticas por intervalo
+                    periods = ""
+                    continue
+                return text
+            max_points = max(5, max_points // 2)
+
+    @staticmethod
+    def _header(serie: OsmaSeries, nombre) -> str:
+        v = serie.values
+        start, end = np.datetime_as_string(serie.dates[[0, -1]], unit="m")
+        return (
+            f"Variable {nombre} ({start} a {end}, {len(v)} mediciones): "
+            f"mín {v.min():.4g}, máx {v.max():.4g}, media {v.mean():.4g}, "
+            f"desv. {v.std():.4g}, primero {v[0]:.4g}, último {v[-1]:.4g}"
+        )
+
+    def _period_stats(self, serie: OsmaSeries) -> str:
+        """
+        Estadísticas por el intervalo más fino (Hora/Día/Mes) que entre en el presupuesto.
+        """
+        for interval in ("Hora", "Día", "Mes"):
+            means = serie.resample(interval, "mean")
+            if len(means) <= 1:
+                return ""
+            if len(means) <= self.max_points // 2:
+                mins = serie.resample(interval, "min").values
+                maxs = serie.resample(interval, "max").values
+                rows = "; ".join(
+                    f"{d} {mn:.4g}/{m:.4g}/{mx:.4g}"
+                    for d, mn, m, mx in zip(np.datetime_as_string(means.dates, unit="m"), mins, means.values, maxs)
+                )
+                return f"Por {interval.lower()} (mín/media/máx): {rows}"
+        return ""
+
+    @staticmethod
+    def _anomalies(serie: OsmaSeries, threshold: float = 3.5, limit: int = 5) -> str:
+        """
+        Marca los valores atípicos según el z-score robusto (mediana y MAD).
+        """
+        v = serie.values
+        median = np.median(v)
+        mad = np.median(np.abs(v - median))
+        if mad == 0:
+            return ""
+        z = 0.6745 * (v - median) / mad
+        outliers = np.flatnonzero(np.abs(z) > threshold)
+        if len(outliers) == 0:
+            return ""
+        top = outliers[np.argsort(-np.abs(z[outliers]))[:limit]]
+        marks = "; ".join(
+            f"{d} {v[i]:.4g}" for d, i in zip(np.datetime_as_string(serie.dates[top], unit="m"), top)
+        )
+        return f"Anomalías ({len(outliers)} en total, se muestran {len(top)}): {marks}"
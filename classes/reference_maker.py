@@ -1,28 +1,46 @@
 # classes/reference_maker.py
 import os
+import hashlib
 import logging
 from rapidfuzz import process, fuzz
 from urllib.parse import quote
 import re
 
+from classes.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
+# Etiquetas de fuente del contexto ([F1], [F2, F5]) y referencias en negrita (**archivo.pdf**)
+SOURCE_TAG_REGEX = re.compile(r"\[\s*(F\d+(?:\s*[,;]\s*F\d+)*)\s*\]")
+BOLD_REFERENCE_REGEX = re.compile(r'\*\*([^*]+)\*\*')
+
 class ReferenceMaker:
-    def __init__(self, docs_directory: str, threshold: int = 80):
+    def __init__(self, docs_directory: str, threshold: int = 80, cache=None, asset_url=None,
+                 docs_url: str = "/static/docs"):
         """
         Inicializa el ReferenceMaker.
 
         Args:
             docs_directory (str): Ruta al directorio que contiene los documentos.
             threshold (int, opcional): Umbral de similitud mínima (porcentaje). Defaults to 80.
+            cache (CacheNamespace, opcional): Caché compartida para las coincidencias ya resueltas.
+            asset_url (callable, opcional): URL con hash de un documento (o None si no la tiene).
+            docs_url (str, opcional): URL del directorio de documentos, para los que no tienen hash.
         """
         self.docs_directory = docs_directory
         self.threshold = threshold
+        self.cache = cache
+        self.asset_url = asset_url
+        self.docs_url = docs_url.rstrip("/")
 
         if not os.path.exists(self.docs_directory):
             raise ValueError(f"El directorio de documentos no existe: {self.docs_directory}")
 
         self.docs_list = self.load_documents()
+        self.docs_set = set(self.docs_list)
+        # Las coincidencias guardadas valen sólo para este catálogo y este umbral
+        catalog = "\n".join(sorted(self.docs_list)) + f"\n{self.threshold}"
+        self.catalog_key = hashlib.sha1(catalog.encode("utf-8")).hexdigest()[:16]
 
     def load_documents(self):
         """
@@ -56,6 +74,16 @@ class ReferenceMaker:
         normalized_ref = self.normalize_reference_name(reference_name)
         logger.info(f"Procesando referencia: {reference_name} (normalizada: {normalized_ref})")
 
+        if self.cache is None:
+            return self._match_filename(reference_name, normalized_ref)
+        # "" marca "sin coincidencia", para no repetir la búsqueda difusa
+        match = self.cache.get_or_compute(
+            f"{self.catalog_key}|{normalized_ref}",
+            lambda: self._match_filename(reference_name, normalized_ref) or "",
+        )
+        return match or None
+
+    def _match_filename(self, reference_name: str, normalized_ref: str):
         # Usar rapidfuzz para encontrar la mejor coincidencia
         match, score, _ = process.extractOne(
             normalized_ref,
@@ -80,71 +108,109 @@ class ReferenceMaker:
         Returns:
             str: El enlace generado.
         """
-        encoded_filename = self.encode_filename_for_url(exact_filename)
-        link = f"/static/docs/{encoded_filename}"
+        hashed_url = self.asset_url(exact_filename) if self.asset_url else None
+        if hashed_url:
+            link = self.encode_filename_for_url(hashed_url)
+        else:
+            link = f"{self.docs_url}/{self.encode_filename_for_url(exact_filename)}"
         logger.info(f"Enlace generado: {link}")
         return link
 
-    def process_text_references_with_citations(self, text: str) -> str:
-        """
-        Procesa el texto para buscar fragmentos entre ** ** (posibles referencias),
-        localiza el archivo correspondiente y añade [i] como cita en el texto.
-        Finalmente, añade al final el bloque de "Referencias:" con enlaces.
-        """
-        doc_regex = re.compile(r'\*\*([^*]+)\*\*')
-        matches = doc_regex.findall(text)
-
-        if not matches:
-            # Sin referencias encontradas, devolvemos el texto tal cual
-            return text
-
-        # Mapeo de (referencia original) -> índice de cita y detalles
-        ref_map = {}
-        ref_details = {}
-        current_index = 1
-
-        # 1) Construimos la tabla de referencias únicas y sus índices
-        for ref_str in matches:
-            # Evitar procesar la misma referencia más de una vez
-            if ref_str in ref_map:
-                continue
-
-            matched_filename = self.find_closest_filename(ref_str)
-            if matched_filename:
-                ref_map[ref_str] = current_index
-                ref_details[current_index] = {
-                    "ref_str": ref_str,
-                    "matched_filename": matched_filename
-                }
-                current_index += 1
-
-        # 2) Definimos una función callback que se usará con re.sub
-        def replacer(match_obj):
-            ref_str_found = match_obj.group(1)  # Lo que está entre ** **
-            if ref_str_found in ref_map:
-                i = ref_map[ref_str_found]
-                # Añadimos la marca de cita [i]
-                return f"**{ref_str_found}** <span class=\"doc-citation-number\">[{i}]</span>"
-            else:
-                # Si no está en ref_map, devolvemos el texto original sin cambios
+    def process_text_references_with_citations(self, text: str, provenance: dict = None) -> str:
+        """
+        Procesa el texto para convertir las citas en números [i] y añade al final el bloque
+        de "Referencias:" con enlaces.
+
+        Las etiquetas de fuente ([F1], [F2, F3]) se resuelven con la tabla de procedencia
+        del contexto (búsqueda exacta, con la página). Los fragmentos entre ** ** (posibles
+        referencias) se buscan primero por nombre exacto y, sólo si no aparecen, por
+        similitud con los archivos del directorio.
+
+        Args:
+            text (str): Respuesta completa del modelo.
+            provenance (dict, opcional): etiqueta -> {"document_id", "file_name", "pages"}.
+        """
+        provenance = provenance or {}
+        # Archivo -> índice de cita y páginas citadas, en orden de aparición
+        references = {}
+
+        def cite(filename: str, pages=()) -> int:
+            reference = references.setdefault(filename, {"index": len(references) + 1, "pages": []})
+            reference["pages"].extend(p for p in pages if p not in reference["pages"])
+            return reference["index"]
+
+        def citation_marks(indexes) -> str:
+            return " ".join(f"<span class=\"doc-citation-number\">[{i}]</span>" for i in indexes)
+
+        # 1) Etiquetas de fuente: tabla de procedencia
+        def replace_tags(match_obj):
+            indexes = []
+            for tag in re.split(r"\s*[,;]\s*", match_obj.group(1)):
+                source = provenance.get(tag)
+                filename = self.local_filename(source["file_name"]) if source else None
+                if filename:
+                    index = cite(filename, source.get("pages") or [])
+                    if index not in indexes:
+                        indexes.append(index)
+            if not indexes:
+                # Etiqueta desconocida: se deja el texto original sin cambios
+                return match_obj.group(0)
+            metrics.increment("citations_exact", len(indexes))
+            return citation_marks(indexes)
+
+        if provenance:
+            text = SOURCE_TAG_REGEX.sub(replace_tags, text)
+
+        # 2) Referencias en negrita: nombre exacto y, si no, búsqueda difusa
+        def replace_bold(match_obj):
+            ref_str = match_obj.group(1)  # Lo que está entre ** **
+            filename = self.resolve_reference(ref_str, provenance)
+            if not filename:
+                # Si no se encontró el archivo, devolvemos el texto original sin cambios
                 return match_obj.group(0)
+            return f"**{ref_str}** {citation_marks([cite(filename)])}"
 
-        # 3) Usamos re.sub con nuestro callback para reemplazar todas las referencias
-        text = doc_regex.sub(replacer, text)
+        text = BOLD_REFERENCE_REGEX.sub(replace_bold, text)
 
-        # 4) Construimos el bloque de referencias al final del texto
-        if ref_details:
+        # 3) Construimos el bloque de referencias al final del texto
+        if references:
             references_block = "\n\n<b>Referencias:</b>\n"
-            for i in sorted(ref_details.keys()):
-                info = ref_details[i]
-                matched = info["matched_filename"]
-                if matched:
-                    link = f"/static/docs/{self.encode_filename_for_url(matched)}"
-                    references_block += (f"<li>[{i}] <a href=\"{link}\" target=\"_blank\">{matched}</a></li>")
+            for filename, reference in references.items():
+                link = self.generate_document_link(filename)
+                label = filename
+                pages = sorted(reference["pages"])
+                if pages:
+                    link += f"#page={pages[0]}"
+                    label += f" (pág. {', '.join(map(str, pages))})"
+                references_block += (f"<li>[{reference['index']}] <a href=\"{link}\" target=\"_blank\">{label}</a></li>")
             text += references_block
 
         return text
 
+    def local_filename(self, file_name: str):
+        """
+        Archivo local de un documento de la búsqueda: el mismo nombre si existe en el
+        directorio y, si no (p. ej. renombrado al ingerirlo), el más parecido.
+        """
+        if file_name in self.docs_set:
+            return file_name
+        return self.find_closest_filename(file_name)
+
+    def resolve_reference(self, ref_str: str, provenance: dict):
+        """
+        Archivo citado por una referencia en negrita: coincidencia exacta con los documentos
+        del contexto o del directorio y, como último recurso, búsqueda difusa.
+        """
+        normalized_ref = self.normalize_reference_name(ref_str).strip()
+        context_files = {source["file_name"] for source in provenance.values()}
+        if normalized_ref in self.docs_set or normalized_ref in context_files:
+            metrics.increment("citations_exact")
+            return self.local_filename(normalized_ref)
+        filename = self.find_closest_filename(ref_str)
+        if filename:
+            metrics.increment("citations_fuzzy")
+        return filename
+
     @staticmethod
     def normalize_reference_name(reference_name: str) -> str:
         """
@@ -0,0 +1,243 @@
+# classes/shared_cache.py
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+from classes.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path() -> str:
+    # /dev/shm es memoria compartida en Linux; si no existe se usa el directorio temporal
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"asistente-cache-{os.getuid() if hasattr(os, 'getuid') else 0}.sqlite")
+
+
+class SharedCache:
+    """
+    Caché local compartida por todos los workers de un host, guardada en SQLite (modo WAL).
+
+    Cada entrada pertenece a un espacio de nombres con su propio TTL. El tamaño total de
+    los valores se mantiene bajo `max_bytes` (el total se lleva en una fila de la tabla
+    meta, actualizada en la misma transacción que cada escritura) descartando primero las
+    entradas vencidas y luego las menos usadas (LRU aproximado: el último acceso se actualiza como mucho cada
+    `touch_interval` segundos). `get_or_compute` es atómico entre workers: sólo uno calcula
+    un valor faltante y los demás esperan a que aparezca.
+
+    Los valores se guardan como JSON, así que deben ser serializables (texto, números, listas).
+    """
+    _instance = None  # Class-level attribute to hold the single instance
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str = None, max_bytes: int = None, lock_timeout: float = 30, touch_interval: float = 5):
+        self.path = path or os.getenv("SHARED_CACHE_PATH") or default_cache_path()
+        self.max_bytes = max_bytes or int(float(os.getenv("SHARED_CACHE_MAX_MB", 64)) * 1024 * 1024)
+        self.lock_timeout = lock_timeout
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._setup()
+
+    @classmethod
+    def get(cls):
+        """
+        Instancia del proceso (el archivo es el mismo para todos los workers).
+        """
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def namespace(self, name: str, ttl: float):
+        return CacheNamespace(self, name, float(os.getenv(f"SHARED_CACHE_TTL_{name.upper()}", ttl)))
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso (las conexiones no sobreviven a un fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _setup(self):
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS locks ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # Sólo la primera vez (o en un archivo de una versión anterior) se suma toda la tabla
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (name, value)"
+            " SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+        )
+
+    def lookup(self, namespace: str, key: str):
+        """
+        Devuelve (True, valor) si hay una entrada vigente, o (False, None).
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires, accessed FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or row[1] < now:
+                metrics.increment(f"shared_cache_{namespace}_misses")
+                return False, None
+            if now - row[2] > self.touch_interval:
+                conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache read failed ({namespace}): {e}")
+            return False, None
+        metrics.increment(f"shared_cache_{namespace}_hits")
+        return True, json.loads(row[0])
+
+    def store(self, namespace: str, key: str, value, ttl: float):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data) + len(key)
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, data, size, now + ttl, now),
+                )
+                conn.execute(
+                    "UPDATE meta SET value = value + ? WHERE name = 'total_size'", (size - (row[0] if row else 0),)
+                )
+                total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            if total > self.max_bytes:
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache write failed ({namespace}): {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+            if total <= self.max_bytes:
+                conn.execute("COMMIT")  # otro worker ya desalojó
+                return
+            total -= conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires < ?", (now,)).fetchone()[0]
+            conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+            evicted = 0
+            # Se libera hasta el 90% del presupuesto para no desalojar en cada escritura
+            for key_namespace, key, size in conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed"
+            ).fetchall():
+                if total <= self.max_bytes * 0.9:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (key_namespace, key))
+                total -= size
+                evicted += 1
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'total_size'", (total,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            metrics.increment("shared_cache_evictions", evicted)
+
+    def get_or_compute(self, namespace: str, key: str, compute, ttl: float):
+        """
+        Devuelve el valor guardado o lo calcula con `compute()`; si otro worker ya lo está
+        calculando, espera su resultado (hasta `lock_timeout`). Las excepciones de
+        `compute` se propagan y no se guardan.
+        """
+        found, value = self.lookup(namespace, key)
+        if found:
+            return value
+
+        deadline = time.monotonic() + self.lock_timeout
+        locked = self._try_lock(namespace, key)
+        while not locked:
+            if time.monotonic() >= deadline:
+                break  # quien tenía el candado no terminó: se calcula igual, sin tomarlo
+            time.sleep(0.05)
+            found, value = self.lookup(namespace, key)
+            if found:
+                return value
+            locked = self._try_lock(namespace, key)
+
+        if locked:
+            # Con el candado tomado, otro worker pudo haber terminado justo antes
+            found, value = self.lookup(namespace, key)
+            if found:
+                self._unlock(namespace, key)
+                return value
+
+        try:
+            value = compute()
+            self.store(namespace, key, value, ttl)
+            return value
+        finally:
+            # Sólo se libera un candado propio: el de otro worker sigue protegiendo su cálculo
+            if locked:
+                self._unlock(namespace, key)
+
+    def _try_lock(self, namespace: str, key: str) -> bool:
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM locks WHERE namespace = ? AND key = ? AND expires < ?", (namespace, key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (namespace, key, expires) VALUES (?, ?, ?)",
+                (namespace, key, now + self.lock_timeout),
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache lock failed ({namespace}): {e}")
+            return True  # sin coordinación se calcula localmente
+
+    def _unlock(self, namespace: str, key: str):
+        try:
+            self._connection().execute("DELETE FROM locks WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache unlock failed ({namespace}): {e}")
+
+
+class CacheNamespace:
+    """
+    Vista de la caché compartida con un espacio de nombres y un TTL fijos.
+    """
+
+    def __init__(self, cache: SharedCache, name: str, ttl: float):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key: str, default=None):
+        found, value = self.cache.lookup(self.name, key)
+        return value if found else default
+
+    def set(self, key: str, value):
+        self.cache.store(self.name, key, value, self.ttl)
+
+    def get_or_compute(self, key: str, compute):
+        return self.cache.get_or_compute(self.name, key, compute, self.ttl)
@@ -0,0 +1,167 @@
+# classes/specialty.py
+import os
+import re
+import json
+import logging
+
+from classes.instruction_parser import InstructionParser
+from classes.reference_maker import ReferenceMaker
+from classes.answer_bank import DEFAULT_BANK_PATH
+from classes.shared_cache import SharedCache
+from classes.static_assets import AssetManifest, STATIC_ROOT
+from classes.topic_router import TopicRouter
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_keywords(filename: str) -> list:
+    """
+    Lee un archivo de palabras clave (una por línea, '#' para comentarios), en minúsculas.
+    """
+    file_path = os.path.join(PROJECT_ROOT, filename)
+    keywords = []
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                # Ignore empty lines or comment lines
+                if not line or line.startswith("#"):
+                    continue
+                keywords.append(line.lower())
+    except FileNotFoundError:
+        logger.warning(f"Could not find {filename}, defaulting to empty keyword list.")
+    return keywords
+
+
+class Specialty:
+    """
+    Datos inmutables de una especialidad: palabras clave, instrucciones, bucket de GroundX
+    y catálogo de documentos. Se construyen una vez por proceso (en el maestro con --preload).
+    """
+
+    def __init__(self, name: str, topic: str, keywords_file: str, instructions_file: str,
+                 bucket_id: int, docs_directory: str, answer_bank_path: str, metadata_path: str = None):
+        self.name = name
+        self.topic = topic  # tema que el clasificador evalúa ("infectologia", "café", ...)
+        self.bucket_id = int(bucket_id)
+        self.answer_bank_path = answer_bank_path
+
+        self.keywords = load_keywords(keywords_file)
+        # Una sola expresión con todas las palabras clave (las más largas primero): una pasada
+        # por la consulta en lugar de un `in` por palabra clave.
+        alternatives = sorted(set(self.keywords), key=len, reverse=True)
+        self.keyword_pattern = re.compile("|".join(map(re.escape, alternatives))) if alternatives else None
+
+        self.instruction_parser = InstructionParser(os.path.join(PROJECT_ROOT, instructions_file))
+        self.instruction_parser.get_instruction()
+
+        # Los documentos se enlazan por su URL con hash (build_assets.py) cuando la tienen
+        docs_path = os.path.relpath(os.path.join(PROJECT_ROOT, docs_directory), STATIC_ROOT).replace(os.sep, "/")
+        self.reference_maker = ReferenceMaker(
+            docs_directory=os.path.join(PROJECT_ROOT, docs_directory),
+            threshold=70,
+            cache=SharedCache.get().namespace("references", 7 * 24 * 3600),
+            asset_url=lambda filename: AssetManifest.get().url(f"{docs_path}/{filename}"),
+            docs_url=f"/static/{docs_path}",
+        )
+
+        # Metadatos de ingesta (libro, parte, páginas, capítulos) para acotar las búsquedas
+        self.topic_router = TopicRouter.load(metadata_path or os.path.join(PROJECT_ROOT, "document_metadata.json"))
+
+    def match_keyword(self, query: str):
+        """
+        Devuelve la primera palabra clave contenida en la consulta, o None.
+        """
+        if self.keyword_pattern is None:
+            return None
+        match = self.keyword_pattern.search(query.lower())
+        return match.group(0) if match else None
+
+    def generation(self):
+        """
+        Versión de las instrucciones y de los documentos de la especialidad.
+        """
+        try:
+            docs_version = os.stat(self.reference_maker.docs_directory).st_mtime_ns
+        except OSError:
+            docs_version = None
+        return self.instruction_parser.version, docs_version
+
+
+class SpecialtyRegistry:
+    """
+    Especialidades servidas por este proceso.
+
+    Se leen de specialties.json (o del archivo en SPECIALTIES_CONFIG) con el formato:
+
+        {
+          "default": "infectologia",
+          "specialties": {
+            "infectologia": {"topic": "infectologia", "keywords": "kw.txt",
+                             "instructions": "instructions.json", "bucket_id": 123,
+                             "docs": "static/docs"},
+            "cafe": {"topic": "café", "keywords": "kw_cafe.txt", "instructions": "instructions_cafe.json",
+                     "bucket_id": 456, "docs": "static/docs_cafe", "answer_bank": "answer_bank_cafe.json",
+                     "metadata": "document_metadata_cafe.json"}
+          }
+        }
+
+    Sin ese archivo se sirve una sola especialidad con la configuración de siempre
+    (kw.txt, instructions.json, static/docs y el bucket de GROUNDX_BUCKET_ID_SPANISH).
+    """
+
+    def __init__(self, specialties: dict, default: str):
+        self.specialties = specialties
+        self.default = specialties[default]
+
+    @classmethod
+    def load(cls, default_bucket_id: int, config_path: str = None):
+        config_path = config_path or os.getenv("SPECIALTIES_CONFIG", os.path.join(PROJECT_ROOT, "specialties.json"))
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            name = os.getenv("SPECIALTY_NAME", "infectologia")
+            config = {
+                "default": name,
+                "specialties": {name: {"topic": name, "bucket_id": default_bucket_id}},
+            }
+
+        default = config.get("default") or next(iter(config["specialties"]))
+        specialties = {}
+        for name, spec in config["specialties"].items():
+            bank_path = spec.get("answer_bank")
+            if bank_path:
+                bank_path = os.path.join(PROJECT_ROOT, bank_path)
+            elif name == default:
+                bank_path = os.getenv("ANSWER_BANK_PATH", DEFAULT_BANK_PATH)
+            else:
+                bank_path = os.path.join(PROJECT_ROOT, f"answer_bank_{name}.json")
+            metadata_file = spec.get("metadata") or (
+                "document_metadata.json" if name == default else f"document_metadata_{name}.json"
+            )
+            specialties[name] = Specialty(
+                name=name,
+                topic=spec.get("topic", name),
+                keywords_file=spec.get("keywords", "kw.txt"),
+                instructions_file=spec.get("instructions", "instructions.json"),
+                bucket_id=spec.get("bucket_id", default_bucket_id),
+                docs_directory=spec.get("docs", os.path.join("static", "docs")),
+                answer_bank_path=bank_path,
+                metadata_path=os.path.join(PROJECT_ROOT, metadata_file),
+            )
+        logger.info(f"Specialties loaded: {list(specialties)} (default '{default}')")
+        return cls(specialties, default)
+
+    def get(self, name: str = None):
+        """
+        Especialidad por nombre (la por defecto si name es vacío); None si no existe.
+        """
+        if not name:
+            return self.default
+        return self.specialties.get(name)
+
+    def __iter__(self):
+        return iter(self.specialties.values())
@@ -0,0 +1,226 @@
+# classes/static_assets.py
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+
+try:
+    import brotli  # opcional: sin él sólo se generan variantes gzip
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STATIC_ROOT = os.path.join(PROJECT_ROOT, "static")
+DEFAULT_BUILD_DIR = os.path.join(PROJECT_ROOT, "static_build")
+ASSET_URL_PREFIX = "/assets/"
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % HASH_LENGTH)
+
+# Sólo se guarda una variante comprimida si ahorra al menos esta fracción del tamaño
+MIN_SAVING = 0.10
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """
+    js/main.js -> js/main.<hash>.js
+    """
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+class AssetBuilder:
+    """
+    Calcula el hash de contenido de cada archivo de static/ y guarda sus variantes
+    precomprimidas (gzip y, si está instalado el paquete `brotli`, br) en el directorio
+    de build, junto con manifest.json. Se ejecuta en cada despliegue (build_assets.py).
+    """
+
+    def __init__(self, static_root: str = STATIC_ROOT, build_dir: str = None):
+        self.static_root = static_root
+        self.build_dir = build_dir or os.getenv("ASSET_BUILD_DIR", DEFAULT_BUILD_DIR)
+
+    def files(self):
+        for root, _, names in os.walk(self.static_root):
+            for name in sorted(names):
+                full_path = os.path.join(root, name)
+                yield os.path.relpath(full_path, self.static_root).replace(os.sep, "/"), full_path
+
+    def build(self) -> dict:
+        previous = AssetManifest.read(self.build_dir)
+        manifest = {}
+        for path, full_path in self.files():
+            stat = os.stat(full_path)
+            entry = previous.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns \
+                    and self._variants_exist(entry):
+                manifest[path] = entry  # sin cambios desde el último build
+                continue
+            with open(full_path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            manifest[path] = {
+                "hash": digest,
+                "name": hashed_name(path, digest),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "encodings": self._compress(hashed_name(path, digest), data),
+            }
+            logger.info(f"Asset {path} -> {digest} {manifest[path]['encodings']}")
+
+        os.makedirs(self.build_dir, exist_ok=True)
+        tmp_path = os.path.join(self.build_dir, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": manifest}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.build_dir, "manifest.json"))
+        self._remove_stale_variants(manifest)
+        return manifest
+
+    def _variants_exist(self, entry: dict) -> bool:
+        return all(os.path.exists(self.variant_path(entry, encoding)) for encoding in entry["encodings"])
+
+    def variant_path(self, entry: dict, encoding: str) -> str:
+        return os.path.join(self.build_dir, entry["name"] + ENCODINGS[encoding])
+
+    def _compress(self, name: str, data: bytes) -> list:
+        variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(data, quality=11)
+        encodings = []
+        for encoding, compressed in variants.items():
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue  # PDFs e imágenes ya vienen comprimidos
+            variant_path = os.path.join(self.build_dir, name + ENCODINGS[encoding])
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            with open(variant_path, "wb") as f:
+                f.write(compressed)
+            encodings.append(encoding)
+        return encodings
+
+    def _remove_stale_variants(self, manifest: dict):
+        keep = {
+            os.path.normpath(self.variant_path(entry, encoding))
+            for entry in manifest.values()
+            for encoding in entry["encodings"]
+        }
+        for root, _, names in os.walk(self.build_dir):
+            for name in names:
+                full_path = os.path.normpath(os.path.join(root, name))
+                if name.endswith(tuple(ENCODINGS.values())) and full_path not in keep:
+                    os.remove(full_path)
+
+
+class AssetManifest:
+    """
+    Manifest de static/ cargado por la aplicación: URLs con hash de contenido
+    (/assets/js/main.<hash>.js, cacheables para siempre) y variantes precomprimidas.
+
+    Los archivos que cambiaron después del último build (tamaño o mtime distintos) se
+    excluyen y siguen sirviéndose por /static, para no publicar nunca contenido nuevo
+    bajo un hash viejo. Sin manifest (build_assets.py no se ejecutó) todo queda igual.
+    """
+    _instance = None  # Class-level attribute to hold the single instance
+
+    def __init__(self, static_root: str = STATIC_ROOT, build_dir: str = None):
+        self.static_root = static_root
+        self.build_dir = build_dir or os.getenv("ASSET_BUILD_DIR", DEFAULT_BUILD_DIR)
+        self.files = self._load()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def read(build_dir: str) -> dict:
+        try:
+            with open(os.path.join(build_dir, "manifest.json"), "r", encoding="utf-8") as f:
+                files = json.load(f)["files"]
+        except FileNotFoundError:
+            return {}
+        for path, entry in files.items():
+            entry["name"] = hashed_name(path, entry["hash"])
+        return files
+
+    def _load(self) -> dict:
+        files = self.read(self.build_dir)
+        if not files:
+            logger.info("No asset manifest found, static files are served without fingerprints.")
+            return {}
+        stale = []
+        for path, entry in list(files.items()):
+            try:
+                stat = os.stat(os.path.join(self.static_root, path))
+            except OSError:
+                stat = None
+            if stat is None or stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+                stale.append(path)
+                del files[path]
+        if stale:
+            logger.warning(f"{len(stale)} static files changed since the last asset build: {stale[:5]}")
+        logger.info(f"Asset manifest loaded: {len(files)} files")
+        return files
+
+    def url(self, path: str):
+        """
+        URL con hash para un archivo relativo a static/, o None si no está en el manifest.
+        """
+        entry = self.files.get(path)
+        return ASSET_URL_PREFIX + entry["name"] if entry else None
+
+    def import_map(self, static_url_path: str = "/static") -> dict:
+        """
+        Import map para los módulos JS: los imports relativos ('./chatUI.js') de un módulo
+        servido desde /assets/js/ se resuelven a /assets/js/chatUI.js y el mapa los lleva a
+        la versión con hash. Así los módulos no se reescriben (hay imports circulares).
+        """
+        imports = {}
+        for path, entry in self.files.items():
+            if path.endswith(".js"):
+                imports[ASSET_URL_PREFIX + path] = ASSET_URL_PREFIX + entry["name"]
+                imports[f"{static_url_path}/{path}"] = ASSET_URL_PREFIX + entry["name"]
+        return {"imports": imports}
+
+    def resolve(self, name: str):
+        """
+        Interpreta el nombre pedido en /assets/<name>.
+
+        Returns:
+            (path, entry, immutable): archivo relativo a static/, su entrada del manifest
+            y si el hash pedido es el actual. (None, None, False) si no se conoce.
+        """
+        match = HASHED_NAME.match(name)
+        if match:
+            path = match.group("stem") + match.group("ext")
+            entry = self.files.get(path)
+            if entry:
+                return path, entry, entry["hash"] == match.group("hash")
+        # Nombre sin hash (navegadores sin import maps) o hash viejo: se sirve sin caché larga
+        entry = self.files.get(name)
+        return (name, entry, False) if entry else (None, None, False)
+
+    def variant(self, entry: dict, accepted) -> tuple:
+        """
+        Mejor variante precomprimida aceptada por el cliente.
+
+        Args:
+            entry (dict): Entrada del manifest.
+            accepted (callable): Calidad aceptada para una codificación (0 si no se acepta).
+
+        Returns:
+            (encoding, path) o (None, None) si hay que servir el archivo original.
+        """
+        for encoding in ("br", "gzip"):
+            if encoding in entry["encodings"] and accepted(encoding) > 0:
+                return encoding, os.path.join(self.build_dir, entry["name"] + ENCODINGS[encoding])
+        return None, None
+
+    @staticmethod
+    def mimetype(path: str) -> str:
+        return mimetypes.guess_type(path)[0] or "application/octet-stream"
@@ -0,0 +1,47 @@
+# classes/stream_coalescer.py
+import os
+import time
+
+from classes.metrics import metrics
+
+
+class StreamCoalescer:
+    """
+    Agrupa los deltas del modelo (a menudo de uno o dos caracteres) antes de escribirlos
+    en la respuesta HTTP.
+
+    El primer fragmento se envía de inmediato para no retrasar el primer token; después
+    se acumula hasta juntar `flush_bytes` o hasta que pasen `flush_ms` milisegundos desde
+    la última escritura. El tiempo se comprueba al llegar cada fragmento, así que un
+    buffer pendiente sale con el siguiente delta o al terminar el stream.
+    """
+
+    def __init__(self, flush_bytes: int = None, flush_ms: float = None):
+        self.flush_bytes = flush_bytes or int(os.getenv("STREAM_FLUSH_BYTES", 256))
+        self.flush_interval = (flush_ms or float(os.getenv("STREAM_FLUSH_MS", 30))) / 1000
+
+    def coalesce(self, chunks):
+        buffer = []
+        size = 0
+        first = True
+        last_flush = time.monotonic()
+        chunks_in = writes_out = 0
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                chunks_in += 1
+                buffer.append(chunk)
+                size += len(chunk.encode("utf-8"))
+                now = time.monotonic()
+                if first or size >= self.flush_bytes or now - last_flush >= self.flush_interval:
+                    first = False
+                    writes_out += 1
+                    yield "".join(buffer)
+                    buffer, size, last_flush = [], 0, time.monotonic()
+            if buffer:
+                writes_out += 1
+                yield "".join(buffer)
+        finally:
+            metrics.increment("stream_chunks_in", chunks_in)
+            metrics.increment("stream_writes_out", writes_out)
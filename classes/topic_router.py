@@ -0,0 +1,89 @@
+# classes/topic_router.py
+import os
+import re
+import json
+import logging
+import unicodedata
+
+from classes.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Palabras demasiado generales para decidir en qué parte del libro buscar
+STOPWORDS = {
+    "como", "cual", "cuales", "cuando", "donde", "entre", "esta", "este", "esto", "para", "pero",
+    "porque", "sobre", "tiene", "tienen", "segun", "desde", "hasta", "puede", "pueden", "otros",
+    "otras", "unos", "unas", "with", "what", "which", "when", "where",
+    "from", "about", "that", "this", "there", "their", "have", "does", "between",
+}
+
+
+def fold(text: str) -> str:
+    """
+    Minúsculas y sin tildes ("Epilepsía" -> "epilepsia").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def terms(text: str) -> set:
+    return {t for t in re.findall(r"\w+", fold(text)) if len(t) >= 4 and not t.isdigit() and t not in STOPWORDS}
+
+
+class TopicRouter:
+    """
+    Elige el subconjunto de documentos de un bucket donde buscar, a partir de los títulos
+    de capítulo guardados por ingest_groundx.py (document_metadata.json).
+
+    Cada término de la consulta que aparece en los capítulos de un documento le suma
+    puntos; los términos presentes en más de `max_fraction` de los documentos no cuentan.
+    Si los mejores candidatos son pocos, la búsqueda se restringe a ellos con un filtro
+    de GroundX sobre el campo `file` de los metadatos; si no, se busca en todo el bucket.
+    """
+
+    def __init__(self, documents: list, max_fraction: float = None):
+        self.max_fraction = max_fraction or float(os.getenv("TOPIC_ROUTER_MAX_FRACTION", 0.3))
+        self.documents = documents
+        self.index = {}
+        for document in documents:
+            for chapter in document.get("chapters", []):
+                for term in terms(chapter):
+                    self.index.setdefault(term, set()).add(document["file"])
+        limit = max(1, int(len(documents) * self.max_fraction))
+        self.index = {term: files for term, files in self.index.items() if len(files) <= limit}
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Router para el catálogo en `path`; sin catálogo, un router que nunca filtra.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                documents = json.load(f)["documents"]
+        except FileNotFoundError:
+            logger.info(f"No document metadata at {path}, searches are not routed.")
+            documents = []
+        logger.info(f"Topic router loaded: {len(documents)} documents from {path}")
+        return cls(documents)
+
+    def route(self, *queries: str):
+        """
+        Filtro de búsqueda de GroundX para las consultas, o None para buscar en todo el bucket.
+        """
+        scores = {}
+        for term in set().union(*(terms(q) for q in queries if q)):
+            for file_name in self.index.get(term, ()):
+                scores[file_name] = scores.get(file_name, 0) + 1
+        if not scores:
+            metrics.increment("topic_router_unrouted")
+            return None
+
+        best = max(scores.values())
+        candidates = sorted(f for f, score in scores.items() if score * 2 >= best)
+        if len(candidates) > len(self.documents) * self.max_fraction:
+            metrics.increment("topic_router_unrouted")
+            return None
+
+        metrics.increment("topic_router_routed")
+        logger.info(f"Search routed to {len(candidates)}/{len(self.documents)} documents: {candidates[:5]}")
+        return {"file": {"$in": candidates}}
@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (se lee automáticamente desde el directorio del proyecto).
+
+Con preload_app la aplicación se importa una sola vez en el proceso maestro: las
+instrucciones, las palabras clave, el catálogo de documentos y el catálogo OSMA quedan
+en memoria compartida copy-on-write por los workers. Los clientes de OpenAI y GroundX
+se crean de forma perezosa en cada worker (classes/clients.py), nunca antes del fork.
+"""
+import gc
+import os
+import time
+
+from classes.metrics import process_rss_mib
+
+_started = time.monotonic()
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") not in ("0", "false", "False")
+
+# Workers gthread: cada worker atiende `threads` peticiones a la vez. Los límites de
+# classes/governor.py son por worker y se calculan a partir de GUNICORN_THREADS, de modo
+# que la cola, el reparto por sesión y el 503 con Retry-After llegan a actuar.
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+
+def when_ready(server):
+    # Congela los objetos ya creados para que el GC no los toque (y no se copien) en los workers
+    gc.freeze()
+    server.log.info(
+        f"Master ready in {time.monotonic() - _started:.2f}s (preload={preload_app}, rss {process_rss_mib():.0f} MiB)"
+    )
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        f"Worker {worker.pid} ready {time.monotonic() - _started:.2f}s after master start "
+        f"(rss {process_rss_mib():.0f} MiB)"
+    )
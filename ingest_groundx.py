@@ -1,16 +1,22 @@
 import os
+import re
+import sys
+import json
 import time
 from dotenv import load_dotenv
 from groundx import Document, GroundX
 from natsort import natsorted
+from PyPDF2 import PdfReader
 
 load_dotenv()
 
 groundx_api_key = os.getenv("GROUNDX_API_KEY")
 bucket_id_spanish = os.getenv("GROUNDX_BUCKET_ID_SPANISH")
 
+PART_NAME = re.compile(r"^(?P<book>.+?)_part(?P<part>\d+)\.pdf$", re.IGNORECASE)
 
-def ingestDocument(file_name, file_type, upload_path, search_data):
+
+def ingestDocument(file_name, file_type, upload_path, search_data, search_filter=None):
     """
     Function to ingest a document using GroundX API.
     """
@@ -23,7 +29,8 @@ def ingestDocument(file_name, file_type, upload_path, search_data):
                 file_name=file_name,
                 file_path=upload_path,
                 file_type=file_type,
-                search_data=search_data
+                search_data=search_data,
+                filter=search_filter
             )
         ]
     )
@@ -43,22 +50,119 @@ def ingestDocument(file_name, file_type, upload_path, search_data):
     return ingest_response
 
 
+def read_outline(reader, offset=0):
+    """
+    Chapter titles (first two outline levels) with their 1-based start page.
+    """
+    chapters = []
+
+    def walk(items, depth):
+        for item in items:
+            if isinstance(item, list):
+                if depth < 2:
+                    walk(item, depth + 1)
+                continue
+            try:
+                page = reader.get_destination_page_number(item) + 1 + offset
+            except Exception:
+                continue
+            chapters.append({"title": str(item.title).strip(), "page": page})
+
+    walk(reader.outline, 1)
+    return sorted(chapters, key=lambda c: c["page"])
+
+
+def chapters_in_range(chapters, page_start, page_end):
+    """
+    Chapters that overlap the page range, including the one already running at page_start.
+    """
+    titles = []
+    for i, chapter in enumerate(chapters):
+        next_page = chapters[i + 1]["page"] if i + 1 < len(chapters) else float("inf")
+        if chapter["page"] <= page_end and next_page > page_start and chapter["title"] not in titles:
+            titles.append(chapter["title"])
+    return titles
+
+
+def build_metadata(directory, file_list, outline_source=None):
+    """
+    Metadata for each part: book, part number, page range in the original book and chapter
+    titles. Page ranges are cumulative over the parts of each book (natural order, as
+    produced by Ingest/splitPDF.py). Split parts keep no outline, so the chapters of the
+    parts of outline_source's book (same file name stem) come from that original (unsplit)
+    PDF; every other file uses its own outline.
+    """
+    book_outline = read_outline(PdfReader(outline_source)) if outline_source else None
+    outline_book = os.path.splitext(os.path.basename(outline_source))[0].lower() if outline_source else None
+    next_page = {}
+    documents = []
+    for file_name in file_list:
+        reader = PdfReader(os.path.join(directory, file_name))
+        match = PART_NAME.match(file_name)
+        book = match.group("book") if match else os.path.splitext(file_name)[0]
+        part = int(match.group("part")) if match else None
+
+        page_start = next_page.get(book, 1)
+        page_end = page_start + len(reader.pages) - 1
+        next_page[book] = page_end + 1
+
+        if book.lower() == outline_book:
+            outline = book_outline
+        else:
+            outline = read_outline(reader, offset=page_start - 1)
+        documents.append({
+            "file": file_name,
+            "book": book.replace("_", " "),
+            "part": part,
+            "page_start": page_start,
+            "page_end": page_end,
+            "chapters": chapters_in_range(outline, page_start, page_end),
+        })
+    return documents
+
+
+def load_catalog(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {document["file"]: document for document in json.load(f)["documents"]}
+    except FileNotFoundError:
+        return {}
+
+
+def save_catalog(path, documents):
+    # Read by classes/topic_router.py to narrow searches to the matching documents
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"documents": documents}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
 if __name__ == "__main__":
-    directory = "static/docs/INFECTOLOGIA/SPLIT"
+    # Usage: python ingest_groundx.py [directory] [original_book.pdf] [document_metadata.json]
+    directory = sys.argv[1] if len(sys.argv) > 1 else "static/docs/INFECTOLOGIA/SPLIT"
+    outline_source = sys.argv[2] if len(sys.argv) > 2 else None
+    catalog_path = sys.argv[3] if len(sys.argv) > 3 else "document_metadata.json"
     file_type = "pdf"
-    search_data = None
 
     # Get all files in the directory and sort them naturally
-    file_list = natsorted(os.listdir(directory))
+    file_list = natsorted(f for f in os.listdir(directory) if f.endswith(".pdf"))
+    metadata = build_metadata(directory, file_list, outline_source)
 
-    # Iterate through sorted PDF files
-    for file_name in file_list:
-        if file_name.endswith(".pdf"):
-            upload_path = os.path.join(directory, file_name)
-            try:
-                print(f"Starting ingestion for: {file_name}")
-                response = ingestDocument(file_name, file_type, upload_path, search_data)
-                print(f"Completed ingestion for: {file_name}")
-                print(f"Server response: {response}")
-            except Exception as e:
-                print(f"Failed to process {file_name}: {e}")
+    # Iterate through sorted PDF files; only ingested documents go to the catalog
+    catalog = load_catalog(catalog_path)
+    for document in metadata:
+        file_name = document["file"]
+        upload_path = os.path.join(directory, file_name)
+        search_filter = {"file": file_name, "book": document["book"]}
+        if document["part"] is not None:
+            search_filter["part"] = document["part"]
+        try:
+            print(f"Starting ingestion for: {file_name} "
+                  f"(pages {document['page_start']}-{document['page_end']}, {len(document['chapters'])} chapters)")
+            response = ingestDocument(file_name, file_type, upload_path, document, search_filter)
+            print(f"Completed ingestion for: {file_name}")
+            print(f"Server response: {response}")
+            catalog[file_name] = document
+            save_catalog(catalog_path, natsorted(catalog.values(), key=lambda d: d["file"]))
+        except Exception as e:
+            print(f"Failed to process {file_name}: {e}")
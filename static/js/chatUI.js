@@ -1,7 +1,7 @@
 // chatUI.js
 
 import { initOsmaSession } from './osmaHandler.js';
-import { sendMessageStream, abortController } from './streamHandler.js';
+import { sendMessageStream, abortController, jsonHeaders } from './streamHandler.js';
 
 /**
  * Initializes the chat UI by appending a welcome message.
@@ -100,7 +100,7 @@ export function eraseLastAndStop() {
   }
 
   // Call the backend to remove the last conversation pair
-  fetch("/erase", { method: "POST" })
+  fetch("/erase", { method: "POST", headers: jsonHeaders })
     .then(response => response.json())
     .then(data => {
       console.log("Backend says:", data.message);
@@ -5,6 +5,7 @@ import { appendAssistantMessage, appendOptionContainers, hideOptionContainers }
 /* Estado global del flujo OSMA (puedes usar window.osmaState que se actualiza en el backend,
    o mantener uno local en el frontend; aquí usamos uno propio para la interacción visual) */
 window.osmaFlowState = {
+  sessionId: null,    // id de la sesión OSMA en el backend
   step: 0,
   services: [],       // servicios seleccionados
   monitoreables: [],  // monitoreables seleccionados
@@ -31,6 +32,7 @@ export function initOsmaSession() {
     .then(response => response.json())
     .then(data => {
       if (data.prompt && data.services) {
+        window.osmaFlowState.sessionId = data.session_id;
         appendAssistantMessage(`<em>${data.prompt}</em>`);
         // Aquí puedes crear dinámicamente un formulario basado en data.services
         showServiceForm(data.services);
@@ -237,7 +239,7 @@ function sendOsmaAnswer(answer) {
   fetch("/osma_respond", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ respuesta: answer })
+    body: JSON.stringify({ session_id: window.osmaFlowState.sessionId, respuesta: answer })
   })
     .then(response => response.json())
     .then(data => {
@@ -249,7 +251,14 @@ function sendOsmaAnswer(answer) {
       const nextPrompt = data.prompt;
       appendAssistantMessage(`<em>${nextPrompt}</em>`);
 
-      if (data.monitoreables) {
+      if (data.candidatos) {
+        // Texto libre resuelto en un solo paso: saltamos directo al formulario de fechas
+        window.osmaFlowState.services = data.services;
+        window.osmaFlowState.monitoreables = data.monitoreables_selected;
+        window.osmaFlowState.variables = data.variables_selected;
+        window.osmaFlowState.step = 3;
+        showDateForm();
+      } else if (data.monitoreables) {
         showMonitoreablesForm(data.monitoreables);
       } else if (data.variables) {
         showVariablesForm(data.variables);
@@ -282,7 +291,7 @@ function executeOsmaQuery(queryData) {
       appendAssistantMessage(`<em>Consulta ejecutada. Respuesta: ${data.resultado}</em>`);
       // Reinicia el modo OSMA
       window.isOSMASession = false;
-      window.osmaFlowState = { step: 0, services: [], monitoreables: [], variables: [], fechaInicio: null, fechaFin: null, intervalo: null };
+      window.osmaFlowState = { sessionId: null, step: 0, services: [], monitoreables: [], variables: [], fechaInicio: null, fechaFin: null, intervalo: null };
       // Aquí puedes agregar una opción para volver al flujo normal o para reiniciar OSMA.
     })
     .catch(err => {
@@ -328,7 +337,7 @@ export function promptAbortProcess() {
     abortYesButton.addEventListener("click", () => {
       console.log("[promptAbortProcess] Usuario confirmó ABORTAR OSMA.");
       window.isOSMASession = false;
-      window.osmaFlowState = { step: 0, services: [], monitoreables: [], variables: [], fechaInicio: null, fechaFin: null, intervalo: null };
+      window.osmaFlowState = { sessionId: null, step: 0, services: [], monitoreables: [], variables: [], fechaInicio: null, fechaFin: null, intervalo: null };
       document.getElementById("osma-abort").remove();
       clearOsmaForms();
       appendAssistantMessage(`<em>Proceso OSMA abortado. Regresando al flujo normal.</em>`);
@@ -6,6 +6,12 @@ import { insertThumbsFeedbackUI } from './thumbsFeedback.js';
 
 export let abortController = null;
 
+// Especialidad de la página (/<especialidad>/); vacía = la especialidad por defecto del servidor
+const specialty = document.body.dataset.specialty || "";
+export const jsonHeaders = specialty
+  ? { "Content-Type": "application/json", "X-Specialty": specialty }
+  : { "Content-Type": "application/json" };
+
 /**
  * Optionally fixes double-escaped math delimiters.
  */
@@ -82,7 +88,7 @@ if (message === "") {
   try {
     const ragResp = await fetch("/check_rag", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: jsonHeaders,
       body: JSON.stringify({ message })
     });
     const ragData = await ragResp.json();
@@ -115,7 +121,7 @@ if (message === "") {
   try {
     const response = await fetch("/chat_stream", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: jsonHeaders,
       body: JSON.stringify({ message: message }),
       signal: abortController.signal, // pass signal here
     });
@@ -299,7 +305,7 @@ export async function sendOptionMessage(message) {
   try {
     const ragResp = await fetch("/check_rag", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: jsonHeaders,
       body: JSON.stringify({ message })
     });
     const ragData = await ragResp.json();
@@ -330,7 +336,7 @@ export async function sendOptionMessage(message) {
   try {
     const response = await fetch("/chat_stream", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: jsonHeaders,
       body: JSON.stringify({ message })
     });
 
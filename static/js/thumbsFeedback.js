@@ -1,4 +1,5 @@
 // thumbsFeedback.js
+import { jsonHeaders } from './streamHandler.js';
 
 /**
  * Envía un pulgar arriba/abajo al endpoint /feedback_rating
@@ -12,9 +13,10 @@ export function sendThumbsFeedback({ question, answer, evaluation, reason = "",
     motivo: reason // Include the reason if provided
   };
 
+  // jsonHeaders lleva X-Specialty: el feedback se guarda con la especialidad de la página
   fetch("/feedback_rating", {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: jsonHeaders,
     body: JSON.stringify(payload),
   })
     .then(res => {